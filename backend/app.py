@@ -1,7 +1,11 @@
 import os
+import json
 import uuid
+import hashlib
 import time
-from flask import Flask, request, jsonify
+import itertools
+import threading
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 
@@ -10,10 +14,14 @@ from gemini_service import (
     generate_questions,
     generate_variation_question
 )
-from ml_service import check_similarity, check_correctness
+from ml_service import check_similarity, check_correctness, check_collusion, embed_answer
+from job_queue import JobQueue, hash_file, DONE, FAILED
+from scheduler import scheduled, scheduler, INTERACTIVE, GENERATION, UPLOAD, STREAM
+from traffic_recorder import install_recorder
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
+install_recorder(app)
 
 # Enable CORS for frontend
 CORS(app, resources={
@@ -36,8 +44,16 @@ ALLOWED_EXTENSIONS = {"pdf"}
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 app.config["MAX_CONTENT_LENGTH"] = 20 * 1024 * 1024  # 20 MB
 
+# Longest a single /api/jobs/<id>/events stream stays open
+JOB_EVENTS_MAX_SECONDS = int(os.environ.get("JOB_EVENTS_MAX_SECONDS", "60"))
+
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Answer ids start at the boot time in ms (so they keep increasing across
+# restarts) and count up, so concurrent submissions never share an id
+_answer_ids = itertools.count(int(time.time() * 1000))
+_answer_id_lock = threading.Lock()
+
 # In-memory storage (use database in production)
 pdf_storage = {}
 question_storage = {}
@@ -56,8 +72,10 @@ def index():
         "endpoints": {
             "health": "/api/health",
             "upload_pdf": "/api/upload-reference",
+            "job_status": "/api/jobs/<job_id>",
             "generate_questions": "/api/questions/generate",
-            "generate_variation": "/api/questions/variation"
+            "generate_variation": "/api/questions/variation",
+            "metrics": "/api/metrics"
         }
     })
 
@@ -71,9 +89,81 @@ def health_check():
     })
 
 
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    """Scheduler queue depth, concurrency and queue wait times per request class."""
+    return jsonify({"scheduler": scheduler.stats()})
+
+
+def store_summary(filename: str, summary: str, concept: str) -> None:
+    """Make an uploaded PDF's summary available to /api/questions/generate.
+    A newer upload with the same filename replaces the older one."""
+    pdf_storage[filename] = {
+        'summary': summary,
+        'concept': concept,
+        'uploaded_at': time.time()
+    }
+
+
+def process_upload(payload: dict, report_progress) -> dict:
+    """Job handler: summarize an uploaded PDF and store it for question generation."""
+    filepath = payload["filepath"]
+    filename = payload["filename"]
+
+    try:
+        print(f"\n📄 Processing PDF: {filename}")
+        print(f"📍 File saved to: {filepath}")
+
+        # Summarize PDF and extract concept (map-reduce for long documents)
+        print("🔄 Calling summarize_pdf...")
+        report_progress("summarizing")
+        result = summarize_pdf(filepath, progress=report_progress)
+        summary = result["summary"]
+        concept = result["concept"]
+        print(f"✅ Generated summary ({len(summary)} chars)")
+        print(f"✅ Identified concept: {concept}")
+
+        # Store for later use
+        store_summary(filename, summary, concept)
+
+        return {
+            "text": summary[:1000],
+            "concept": concept,
+            "filename": filename,
+            "full_summary_length": len(summary),
+            "summary": summary,
+        }
+
+    finally:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+
+job_queue = JobQueue()
+job_queue.register("upload", process_upload)
+
+
+@app.before_request
+def start_job_workers():
+    # Started on first request rather than at import so the debug reloader's
+    # parent process doesn't also claim jobs.
+    job_queue.start()
+
+
+def _job_response(job: dict) -> dict:
+    """Public view of a job (the full summary stays server-side)."""
+    body = dict(job)
+    result = job.get("result")
+    if result:
+        body["result"] = {k: v for k, v in result.items() if k != "summary"}
+    body["status_url"] = f"/api/jobs/{job['job_id']}"
+    return body
+
+
 @app.route("/api/upload-reference", methods=["POST"])
+@scheduled(UPLOAD)
 def upload_pdf():
-    """Upload PDF, extract text, identify concept."""
+    """Accept a PDF and queue it for summarization. Poll /api/jobs/<id> for the result."""
     
     if "pdf" not in request.files:
         return jsonify({"error": "No file uploaded. Use 'pdf' as the field name."}), 400
@@ -92,45 +182,77 @@ def upload_pdf():
     
     try:
         file.save(filepath)
+        content_hash = hash_file(filepath)
 
-        print(f"\n📄 Processing PDF: {filename}")
-        print(f"📍 File saved to: {filepath}")
-
-        # Summarize PDF and extract concept in a single Gemini call
-        print("🔄 Calling summarize_pdf...")
-        result = summarize_pdf(filepath)
-        summary = result["summary"]
-        concept = result["concept"]
-        print(f"✅ Generated summary ({len(summary)} chars)")
-        print(f"✅ Identified concept: {concept}")
-
-        # Store for later use
-        pdf_storage[filename] = {
-            'summary': summary,
-            'concept': concept,
-            'uploaded_at': time.time()
-        }
-
-        return jsonify({
-            "text": summary[:1000],
-            "concept": concept,
+        job, created = job_queue.submit("upload", content_hash, {
+            "filepath": filepath,
             "filename": filename,
-            "full_summary_length": len(summary)
         })
+        if created:
+            print(f"📥 Queued PDF {filename} as job {job['job_id']}")
+        else:
+            # Same content already queued or processed -- reuse that job
+            print(f"♻️  Duplicate upload of {filename}, reusing job {job['job_id']}")
+            os.remove(filepath)
+            if job["status"] == DONE:
+                # Already summarized: this upload still becomes the current
+                # version of its filename, as a fresh upload would.
+                result = job["result"]
+                store_summary(filename, result["summary"], result["concept"])
+                job["result"] = dict(result, filename=filename)
+
+        status_code = 200 if job["status"] == DONE else 202
+        return jsonify(_job_response(job)), status_code
 
     except Exception as e:
         import traceback
-        print(f"❌ Error processing PDF: {e}")
+        print(f"❌ Error queueing PDF: {e}")
         print(f"🔍 Full traceback:")
         traceback.print_exc()
-        return jsonify({"error": f"Error processing PDF: {str(e)}"}), 500
-        
-    finally:
         if os.path.exists(filepath):
             os.remove(filepath)
+        return jsonify({"error": f"Error processing PDF: {str(e)}"}), 500
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+@scheduled(INTERACTIVE)
+def get_job(job_id):
+    """Status of a background job, with its result once done."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(_job_response(job))
+
+
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+@scheduled(STREAM)
+def stream_job(job_id):
+    """Server-sent events stream of job status until it finishes.
+
+    Streams are closed after JOB_EVENTS_MAX_SECONDS so they can't pin a
+    server thread; EventSource clients reconnect automatically.
+    """
+    if job_queue.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def events():
+        last = None
+        deadline = time.time() + JOB_EVENTS_MAX_SECONDS
+        while time.time() < deadline:
+            job = job_queue.get(job_id)
+            snapshot = (job["status"], job["progress"])
+            if snapshot != last:
+                last = snapshot
+                yield f"data: {json.dumps(_job_response(job))}\n\n"
+            if job["status"] in (DONE, FAILED):
+                return
+            time.sleep(1)
+
+    return Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 
 @app.route("/api/questions/generate", methods=["POST"])
+@scheduled(GENERATION)
 def generate_quiz_questions():
     """
     Generate 10 questions with intelligent distribution.
@@ -191,6 +313,7 @@ def generate_quiz_questions():
 
 
 @app.route("/api/questions/variation", methods=["POST"])
+@scheduled(GENERATION)
 def generate_question_variation():
     """
     Generate a variation of a question when student needs more practice.
@@ -236,22 +359,34 @@ def generate_question_variation():
 
 
 @app.route("/api/answers", methods=["POST"])
+@scheduled(INTERACTIVE)
 def submit_answer():
     """Submit student answer"""
     data = request.get_json()
+    with _answer_id_lock:
+        answer_id = next(_answer_ids)
     
     return jsonify({
-        "answer_id": int(time.time() * 1000),
+        "answer_id": answer_id,
         "status": "submitted",
         "message": "Answer submitted successfully"
     })
 
 
+def question_key(concept: str, question_id, sample_answer: str) -> str:
+    """Identify a question across requests. Question ids restart at 1 for every
+    generated set, so the sample answer is included to tell sets apart."""
+    raw = f"{concept}\0{question_id}\0{sample_answer}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
 @app.route("/api/answers/<int:answer_id>/detect", methods=["POST"])
+@scheduled(INTERACTIVE)
 def run_detection(answer_id):
     """
     Run memorization detection using ML models.
-    Uses similarity (all-MiniLM-L6-v2) and correctness (nli-deberta-v3-base).
+    Uses similarity (all-MiniLM-L6-v2) and correctness (nli-deberta-v3-base,
+    optionally behind a small-model cascade -- see NLI_MODE in ml_service).
     """
     data = request.get_json()
 
@@ -273,17 +408,36 @@ def run_detection(answer_id):
         return jsonify({"error": "answer_text is required"}), 400
 
     try:
+        # Run collusion check (student answer vs other students' answers).
+        # Skipped for MCQ, where identical letter answers are expected.
+        answer_embedding = None
+        collusion = {"matches": [], "is_suspected": False, "checked_against": 0, "search_ms": 0.0}
+        if question_type != "multiple_choice":
+            answer_embedding = embed_answer(answer_text)
+            # Only the current client's per-browser id (a string) identifies a
+            # student; older clients sent a placeholder number for everyone,
+            # and excluding on that would hide every match.
+            student_id = data.get("student_id")
+            if not isinstance(student_id, str) or not student_id:
+                student_id = None
+            collusion = check_collusion(
+                question_key(concept, data.get("question_id"), sample_answer),
+                answer_id,
+                student_id,
+                answer_embedding
+            )
+
         # Run similarity check (student answer vs source material)
-        similarity = check_similarity(answer_text, summary) if summary else {"score": 0.0, "is_memorized": False}
+        similarity = check_similarity(answer_text, summary, answer_embedding) if summary else {"score": 0.0, "is_memorized": False}
 
         # Run correctness check
         if question_type == "multiple_choice" and correct_answer:
             # MCQ: simple letter comparison
             is_correct = answer_text.strip().upper() == correct_answer.strip().upper()
-            correctness = {"label": "entailment" if is_correct else "contradiction", "scores": {}}
+            correctness = {"label": "entailment" if is_correct else "contradiction", "scores": {}, "stage": "exact_match"}
         else:
             # Open-ended: use NLI model
-            correctness = check_correctness(answer_text, sample_answer) if sample_answer else {"label": "neutral", "scores": {}}
+            correctness = check_correctness(answer_text, sample_answer) if sample_answer else {"label": "neutral", "scores": {}, "stage": "none"}
  
         similarity_score = similarity["score"]
         correctness_label = correctness["label"]
@@ -311,6 +465,7 @@ def run_detection(answer_id):
             "needs_more_practice": needs_practice,
             "similarity": similarity,
             "correctness": correctness,
+            "collusion": collusion,
             "evidence": {
                 "similarity_score": similarity_score,
                 "response_time": data.get("response_time_seconds", 45),
@@ -0,0 +1,98 @@
+"""Startup benchmark: import time of app.py and RSS at first request.
+
+Each run happens in a fresh interpreter so nothing is already imported.
+Exits non-zero if a threshold is exceeded or a heavy dependency
+(torch, sentence_transformers, google.genai) gets imported at startup,
+so it can gate CI against cold-start regressions.
+
+Usage:
+    python bench_startup.py
+    python bench_startup.py --runs 5 --max-import-ms 1500 --max-rss-mb 150
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that should only load once a route actually needs them
+HEAVY_MODULES = ["torch", "sentence_transformers", "transformers", "google.genai"]
+
+_CHILD = r"""
+import json, os, sys, time
+start = time.perf_counter()
+import app
+import_ms = (time.perf_counter() - start) * 1000
+
+client = app.app.test_client()
+start = time.perf_counter()
+response = client.get("/api/health")
+first_request_ms = (time.perf_counter() - start) * 1000
+
+rss_kb = 0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss_kb = int(line.split()[1])
+
+print(json.dumps({
+    "import_ms": import_ms,
+    "first_request_ms": first_request_ms,
+    "status": response.status_code,
+    "rss_mb": rss_kb / 1024,
+    "heavy_loaded": [m for m in HEAVY if m in sys.modules],
+}))
+"""
+
+
+def run_once() -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, JOB_DB_PATH=os.path.join(tmp, "jobs.sqlite3"))
+        code = f"HEAVY = {HEAVY_MODULES!r}\n" + _CHILD
+        proc = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+        )
+    if proc.returncode != 0:
+        print(proc.stderr, file=sys.stderr)
+        raise RuntimeError("Benchmark child process failed")
+    # The app prints banners on import; the measurement is the last line
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-rss-mb", type=float, default=None)
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    summary = {
+        "runs": args.runs,
+        "import_ms": round(statistics.median(r["import_ms"] for r in results), 1),
+        "first_request_ms": round(statistics.median(r["first_request_ms"] for r in results), 1),
+        "rss_mb": round(statistics.median(r["rss_mb"] for r in results), 1),
+        "heavy_loaded": sorted({m for r in results for m in r["heavy_loaded"]}),
+    }
+    print(json.dumps(summary, indent=2))
+
+    failures = []
+    if summary["heavy_loaded"]:
+        failures.append(f"heavy modules imported at startup: {', '.join(summary['heavy_loaded'])}")
+    if args.max_import_ms is not None and summary["import_ms"] > args.max_import_ms:
+        failures.append(f"import time {summary['import_ms']}ms > {args.max_import_ms}ms")
+    if args.max_rss_mb is not None and summary["rss_mb"] > args.max_rss_mb:
+        failures.append(f"RSS {summary['rss_mb']}MB > {args.max_rss_mb}MB")
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Cosine similarity above which two students' answers are flagged as copied
+COLLUSION_THRESHOLD = float(os.environ.get("COLLUSION_THRESHOLD", "0.9"))
+COLLUSION_TOP_K = int(os.environ.get("COLLUSION_TOP_K", "5"))
+# Opt-in approximate nearest-neighbor search via hnswlib (optional dependency)
+USE_ANN = os.environ.get("COLLUSION_ANN", "").lower() in ("1", "true", "yes")
+# Below this many answers an exact matrix product is faster than the ANN index
+ANN_MIN_SIZE = int(os.environ.get("COLLUSION_ANN_MIN_SIZE", "5000"))
+
+# Questions whose indexes are kept; the least recently used are evicted
+MAX_QUESTIONS = int(os.environ.get("COLLUSION_MAX_QUESTIONS", "2000"))
+
+# Most questions only get a handful of answers; the matrix doubles as needed
+INITIAL_CAPACITY = 16
+
+
+class AnswerIndex:
+    """Embeddings of every answer submitted to one question.
+
+    Vectors are L2-normalised and stored row-wise in a preallocated float32
+    matrix that doubles when full, so an exact search is one matrix-vector
+    product. With ``use_ann`` the rows are mirrored into an hnswlib index,
+    which is queried instead once the question has ANN_MIN_SIZE answers.
+    """
+
+    def __init__(self, dim: int, use_ann: bool = False):
+        self.dim = dim
+        self._matrix = np.empty((INITIAL_CAPACITY, dim), dtype=np.float32)
+        self._answer_ids = []
+        self._student_ids = []
+        self._rows = {}  # (answer_id, student_id) -> matrix row
+        self._lock = threading.Lock()
+        self._ann = _new_ann_index(dim) if use_ann else None
+
+    def __len__(self) -> int:
+        return len(self._answer_ids)
+
+    def __contains__(self, key) -> bool:
+        return key in self._rows
+
+    def add(self, answer_id, student_id, embedding: np.ndarray) -> None:
+        """Index an answer. Re-adding the same answer_id for the same student
+        replaces its row."""
+        key = (answer_id, student_id)
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                row = len(self._answer_ids)
+                if row == self._matrix.shape[0]:
+                    grown = np.empty((row * 2, self.dim), dtype=np.float32)
+                    grown[:row] = self._matrix
+                    self._matrix = grown
+                self._rows[key] = row
+                self._answer_ids.append(answer_id)
+                self._student_ids.append(student_id)
+            self._matrix[row] = embedding
+            if self._ann is not None:
+                if row >= self._ann.get_max_elements():
+                    self._ann.resize_index(max(row * 2, INITIAL_CAPACITY))
+                # Adding an existing label updates that element in place
+                self._ann.add_items(embedding[np.newaxis, :], [row])
+
+    def search(self, embedding: np.ndarray, threshold: float, k: int, exclude_answer=None, exclude_student=None) -> list[dict]:
+        """Nearest prior answers with cosine similarity >= threshold, best first.
+
+        ``exclude_answer`` is an (answer_id, student_id) pair whose own row is
+        skipped (re-running detection);
+        ``exclude_student`` skips that student's other submissions.
+        """
+        with self._lock:
+            n = len(self._answer_ids)
+            if n == 0:
+                return []
+
+            if self._ann is not None and n >= ANN_MIN_SIZE:
+                # Over-fetch so excluded (same-student) rows don't crowd out matches
+                labels, distances = self._ann.knn_query(embedding, k=min(n, k * 2))
+                candidates = zip(labels[0].tolist(), (1.0 - distances[0]).tolist())
+            else:
+                scores = self._matrix[:n] @ embedding
+                hits = np.nonzero(scores >= threshold)[0]
+                if len(hits) > k * 2:
+                    hits = hits[np.argpartition(-scores[hits], k * 2)[:k * 2]]
+                candidates = ((int(i), float(scores[i])) for i in hits)
+
+            matches = [
+                {
+                    "answer_id": self._answer_ids[i],
+                    "student_id": self._student_ids[i],
+                    "score": round(score, 4),
+                }
+                for i, score in candidates
+                if score >= threshold
+                and (self._answer_ids[i], self._student_ids[i]) != exclude_answer
+                and (exclude_student is None or self._student_ids[i] != exclude_student)
+            ]
+        matches.sort(key=lambda m: m["score"], reverse=True)
+        return matches[:k]
+
+
+def _new_ann_index(dim: int):
+    try:
+        import hnswlib
+    except ImportError:
+        print("⚠️  COLLUSION_ANN is set but hnswlib is not installed; using exact search")
+        return None
+    index = hnswlib.Index(space="cosine", dim=dim)
+    index.init_index(max_elements=INITIAL_CAPACITY, ef_construction=200, M=16)
+    index.set_ef(64)
+    return index
+
+
+class CollusionIndex:
+    """Per-question AnswerIndex registry used by /detect."""
+
+    def __init__(
+        self,
+        threshold: float = COLLUSION_THRESHOLD,
+        top_k: int = COLLUSION_TOP_K,
+        use_ann: bool = USE_ANN,
+        max_questions: int = MAX_QUESTIONS,
+    ):
+        self.threshold = threshold
+        self.top_k = top_k
+        self.use_ann = use_ann
+        self.max_questions = max_questions
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check_and_add(self, question_key: str, answer_id, student_id, embedding: np.ndarray) -> dict:
+        """Find earlier answers to the same question that are near-duplicates
+        of this one, then add (or, for a repeated answer_id from the same
+        student, replace) this answer in the index. Pass ``student_id=None``
+        when the caller has no reliable student identity; nothing is then
+        excluded except this answer itself.
+        """
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            index = self._indexes.get(question_key)
+            if index is None:
+                index = self._indexes[question_key] = AnswerIndex(len(embedding), self.use_ann)
+                while len(self._indexes) > self.max_questions:
+                    self._indexes.popitem(last=False)
+            else:
+                self._indexes.move_to_end(question_key)
+
+        start = time.perf_counter()
+        matches = index.search(
+            embedding, self.threshold, self.top_k,
+            exclude_answer=(answer_id, student_id), exclude_student=student_id,
+        )
+        search_ms = (time.perf_counter() - start) * 1000
+        checked_against = len(index) - ((answer_id, student_id) in index)
+        index.add(answer_id, student_id, embedding)
+
+        return {
+            "matches": matches,
+            "is_suspected": bool(matches),
+            "checked_against": checked_against,
+            "search_ms": round(search_ms, 3),
+        }
@@ -0,0 +1,52 @@
+"""Offline evaluation of the two-stage NLI cascade.
+
+Scores every pair with both the small and the full NLI model, then reports,
+for each margin threshold, how often the cascade would escalate to the full
+model and how often its label agrees with full-model-only scoring.
+
+Input is a JSONL file with one {"sample_answer": ..., "student_answer": ...}
+object per line.
+
+Usage:
+    python eval_nli_cascade.py answers.jsonl
+    python eval_nli_cascade.py answers.jsonl --thresholds 0.1,0.2,0.3,0.5
+"""
+import argparse
+import json
+import sys
+
+from ml_service import CASCADE_MARGIN, evaluate_cascade
+
+
+def load_pairs(path: str) -> list[tuple[str, str]]:
+    pairs = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                pairs.append((row["sample_answer"], row["student_answer"]))
+    return pairs
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pairs_file")
+    parser.add_argument("--thresholds", default=f"0,0.1,0.2,{CASCADE_MARGIN},0.5")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.pairs_file)
+    if not pairs:
+        print("❌ No pairs found", file=sys.stderr)
+        return 1
+
+    thresholds = sorted({float(t) for t in args.thresholds.split(",")})
+    print(f"📊 Evaluating cascade on {len(pairs)} pairs")
+    print(f"{'threshold':>10} {'escalation':>11} {'agreement':>10}")
+    for report in evaluate_cascade(pairs, thresholds, args.batch_size):
+        print(f"{report['threshold']:>10.2f} {report['escalation_rate']:>10.1%} {report['agreement']:>10.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,60 @@
 import json
 import asyncio
-from google import genai
-from google.genai import types
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
 import os
 
+import gemini_stub
+import traffic_recorder
+from resilience import CircuitBreaker, LatencyTracker, PoolSaturatedError, hedged_call
+
+if TYPE_CHECKING:
+    from google import genai
+
+# google.genai is imported lazily (in get_client / the call sites below) so
+# that importing this module -- and therefore app.py -- stays cheap.
+
 MODEL = "gemini-2.5-flash"
 
-# Lazy-initialized client that reloads .env on key changes
-_client = None
+# Tail-latency control for Gemini calls (see _generate_content)
+GEMINI_TIMEOUT = float(os.environ.get("GEMINI_TIMEOUT", "60"))
+SUMMARY_TIMEOUT = float(os.environ.get("GEMINI_SUMMARY_TIMEOUT", "300"))
+HEDGE_DEFAULT_DELAY = float(os.environ.get("GEMINI_HEDGE_DELAY", "15"))
+BREAKER_FAILURES = int(os.environ.get("GEMINI_BREAKER_FAILURES", "5"))
+BREAKER_PROBE_INTERVAL = float(os.environ.get("GEMINI_BREAKER_PROBE_INTERVAL", "10"))
+
+# Map-reduce summarization for long PDFs (see summarize_pdf)
+# "auto" uses map-reduce above MAP_REDUCE_MIN_PAGES; "single" / "map_reduce" force a mode.
+SUMMARY_MODE = os.environ.get("SUMMARY_MODE", "auto")
+MAP_REDUCE_MIN_PAGES = int(os.environ.get("MAP_REDUCE_MIN_PAGES", "40"))
+PAGES_PER_CHUNK = int(os.environ.get("SUMMARY_PAGES_PER_CHUNK", "15"))
+SUMMARY_CONCURRENCY = int(os.environ.get("SUMMARY_CONCURRENCY", "4"))
+CHUNK_CACHE_SIZE = int(os.environ.get("SUMMARY_CHUNK_CACHE_SIZE", "512"))
+# Gemini calls in flight for summarization, across all upload jobs
+SUMMARY_POOL_SIZE = int(os.environ.get("SUMMARY_POOL_SIZE", str(SUMMARY_CONCURRENCY)))
+
+# Lazy-initialized clients (one per request timeout) that reload .env on key changes
+_clients = {}
 _current_key = None
 
 
-def get_client() -> genai.Client:
-    """Get the Gemini client, reinitializing if the API key has changed."""
-    global _client, _current_key
+def get_client(timeout: float = GEMINI_TIMEOUT) -> "genai.Client":
+    """Get a Gemini client whose HTTP requests give up after ``timeout``
+    seconds, reinitializing if the API key has changed.
+
+    hedged_call can't cancel an attempt that is already running, so without
+    a transport timeout an abandoned attempt would hold its pool thread for
+    as long as Gemini hangs.
+    """
+    global _current_key
+    from google import genai
+    from google.genai import types
 
     # Ensure event loop exists in current thread (Flask debug mode runs in threads without one)
     try:
@@ -31,17 +71,152 @@ def get_client() -> genai.Client:
             "Please ensure .env file exists in backend/ directory with GEMINI_API_KEY set"
         )
 
-    if _client is None or api_key != _current_key:
-        print("Initializing Gemini client...")
-        _client = genai.Client(api_key=api_key)
+    if api_key != _current_key:
+        _clients.clear()
         _current_key = api_key
+    client = _clients.get(timeout)
+    if client is None:
+        print("Initializing Gemini client...")
+        client = _clients[timeout] = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(timeout=int(timeout * 1000)),  # milliseconds
+        )
         print("Gemini client initialized successfully")
 
-    return _client
+    return client
+
+
+def _probe_gemini() -> None:
+    """Cheap request used by the circuit breaker to detect recovery."""
+    _probe_pool.submit(
+        lambda: get_client().models.generate_content(model=MODEL, contents="Reply with OK")
+    ).result(timeout=GEMINI_TIMEOUT)
+
+
+_breaker = CircuitBreaker(
+    "gemini",
+    probe=_probe_gemini,
+    failure_threshold=BREAKER_FAILURES,
+    probe_interval=BREAKER_PROBE_INTERVAL,
+)
+_latency = {}  # per-operation LatencyTracker, since prompt sizes differ a lot
+# Separate thread pools so long summarization calls (map-reduce chunks can
+# run for minutes) never queue ahead of interactive question generation,
+# and the breaker's probe never queues behind either.
+_interactive_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="gemini")
+_summary_pool = ThreadPoolExecutor(max_workers=SUMMARY_POOL_SIZE, thread_name_prefix="gemini-summary")
+_probe_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gemini-probe")
+# Deadlines (start + timeout) of Gemini attempts currently running, per pool
+_in_flight = {_interactive_pool: {}, _summary_pool: {}}
+_in_flight_lock = threading.Lock()
+
+
+def _stuck_attempts(pool: ThreadPoolExecutor) -> int:
+    """Attempts on ``pool`` still running past their timeout -- abandoned by
+    hedged_call but holding a thread because Gemini never answered."""
+    now = time.monotonic()
+    with _in_flight_lock:
+        return sum(1 for deadline in _in_flight[pool].values() if deadline < now)
+
+
+def _is_upstream_failure(error: Exception) -> bool:
+    """Whether an error means Gemini itself is unhealthy: timeouts, 5xx
+    responses and connection errors. Client errors such as a rejected or
+    oversized PDF are deterministic and must not trip the breaker."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    try:
+        from google.genai import errors
+        if isinstance(error, errors.APIError):
+            return isinstance(error, errors.ServerError) or (error.code or 0) >= 500
+    except ImportError:
+        pass
+    try:
+        import httpx
+        if isinstance(error, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    return False
+
+
+def _generate_content(op: str, contents, config=None, hedge: bool = True, timeout: float = GEMINI_TIMEOUT):
+    """Call Gemini behind the circuit breaker, with a timeout and hedging.
+
+    If the call hasn't returned after the operation's p95 latency, a
+    duplicate request is sent and whichever answers first wins. The timeout
+    starts when the call begins running on its pool, not while it queues. Raises
+    CircuitOpenError straight away while Gemini is known to be down, so
+    callers drop to their fallback path without waiting for a timeout.
+    """
+    _breaker.before_call()
+    tracker = _latency.setdefault(op, LatencyTracker(default_delay=HEDGE_DEFAULT_DELAY))
+
+    pool = _summary_pool if op.startswith("summarize") else _interactive_pool
+
+    def call():
+        token = object()
+        start = time.monotonic()
+        with _in_flight_lock:
+            _in_flight[pool][token] = start + timeout
+        try:
+            if gemini_stub.enabled():
+                response = gemini_stub.generate(op, contents)
+            else:
+                response = get_client(timeout).models.generate_content(model=MODEL, contents=contents, config=config)
+        finally:
+            with _in_flight_lock:
+                del _in_flight[pool][token]
+        elapsed = time.monotonic() - start
+        tracker.record(elapsed)
+        traffic_recorder.record_upstream(op, elapsed)
+        return response
 
+    try:
+        response = hedged_call(
+            call, pool, tracker.hedge_delay() if hedge else None, timeout
+        )
+    except PoolSaturatedError:
+        if _stuck_attempts(pool):
+            # The threads are tied up by Gemini calls that never answered
+            print(f"⏳ Gemini {op} call found its pool full of hung Gemini calls")
+            _breaker.record_failure()
+        else:
+            # Our own threads were busy with healthy calls; not Gemini's fault
+            print(f"⏳ No free thread for Gemini {op} call")
+        raise
+    except Exception as e:
+        if _is_upstream_failure(e):
+            _breaker.record_failure()
+        raise
+    _breaker.record_success()
+    return response
+
+
+_SUMMARY_PROMPT = (
+    "Read this entire document carefully. Return a JSON object with two fields:\n"
+    "1. \"summary\": A detailed summary of the key concepts, main ideas, "
+    "important facts, definitions, and any formulas or processes described. "
+    "Be thorough -- this summary will be used to generate quiz questions.\n"
+    "2. \"concept\": The main concept or topic of the document in 2-5 words "
+    "(e.g., \"Photosynthesis\", \"Cell Division\", \"World War II\", \"Calculus Derivatives\")."
+)
+
+# Partial summaries keyed by the hash of their page range's PDF bytes
+_chunk_cache = OrderedDict()
+_chunk_cache_lock = threading.Lock()
+
+
+def summarize_pdf(pdf_path: str, progress=None) -> dict:
+    """Return a summary + main concept for a PDF.
+
+    Short documents are summarized in a single Gemini call. Long ones are
+    split into page ranges that are summarized concurrently and merged by a
+    final reduce call. ``progress`` is an optional callback taking a status
+    message.
+    """
+    from google.genai import types
 
-def summarize_pdf(pdf_path: str) -> dict:
-    """Upload a PDF and return a summary + main concept in a single Gemini call."""
     try:
         print(f"📖 Reading PDF from: {pdf_path}")
         if not os.path.exists(pdf_path):
@@ -51,33 +226,34 @@ def summarize_pdf(pdf_path: str) -> dict:
             pdf_bytes = f.read()
 
         print(f"📄 PDF size: {len(pdf_bytes)} bytes")
-        print(f"🤖 Calling Gemini API with model: {MODEL}")
-
-        response = get_client().models.generate_content(
-            model=MODEL,
-            contents=[
-                types.Part.from_bytes(
-                    data=pdf_bytes,
-                    mime_type="application/pdf",
-                ),
-                (
-                    "Read this entire document carefully. Return a JSON object with two fields:\n"
-                    "1. \"summary\": A detailed summary of the key concepts, main ideas, "
-                    "important facts, definitions, and any formulas or processes described. "
-                    "Be thorough -- this summary will be used to generate quiz questions.\n"
-                    "2. \"concept\": The main concept or topic of the document in 2-5 words "
-                    "(e.g., \"Photosynthesis\", \"Cell Division\", \"World War II\", \"Calculus Derivatives\")."
+
+        chunks = _split_pdf(pdf_bytes) if SUMMARY_MODE != "single" else []
+        num_pages = chunks[-1][1] if chunks else 0
+        if chunks and (SUMMARY_MODE == "map_reduce" or num_pages > MAP_REDUCE_MIN_PAGES):
+            result = _summarize_map_reduce(chunks, progress)
+        else:
+            print(f"🤖 Calling Gemini API with model: {MODEL}")
+            response = _generate_content(
+                "summarize",
+                contents=[
+                    types.Part.from_bytes(
+                        data=pdf_bytes,
+                        mime_type="application/pdf",
+                    ),
+                    _SUMMARY_PROMPT,
+                ],
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
                 ),
-            ],
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-            ),
-        )
+                hedge=False,
+                timeout=SUMMARY_TIMEOUT,
+            )
 
-        if not response.text:
-            raise ValueError("Gemini API returned empty response")
+            if not response.text:
+                raise ValueError("Gemini API returned empty response")
+
+            result = json.loads(str(response.text))
 
-        result = json.loads(str(response.text))
         if "summary" not in result or "concept" not in result:
             raise ValueError("Gemini response missing 'summary' or 'concept' field")
 
@@ -90,11 +266,130 @@ def summarize_pdf(pdf_path: str) -> dict:
         raise
 
 
+def _split_pdf(pdf_bytes: bytes) -> list[tuple[int, int, bytes]]:
+    """Split a PDF into (first_page, last_page, pdf_bytes) ranges, 1-indexed.
+
+    Returns an empty list if the PDF can't be parsed (e.g. encrypted), in
+    which case the caller falls back to a single summarization call.
+    """
+    from PyPDF2 import PdfReader, PdfWriter
+
+    try:
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        num_pages = len(reader.pages)
+        if num_pages <= MAP_REDUCE_MIN_PAGES and SUMMARY_MODE != "map_reduce":
+            return [(1, num_pages, pdf_bytes)]
+
+        chunks = []
+        for first in range(0, num_pages, PAGES_PER_CHUNK):
+            last = min(first + PAGES_PER_CHUNK, num_pages)
+            writer = PdfWriter()
+            for i in range(first, last):
+                writer.add_page(reader.pages[i])
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            chunks.append((first + 1, last, buffer.getvalue()))
+        return chunks
+    except Exception as e:
+        print(f"⚠️  Could not split PDF, summarizing in one call: {e}")
+        return []
+
+
+def _summarize_chunk(first_page: int, last_page: int, chunk_bytes: bytes) -> str:
+    """Summarize one page range, reusing a cached result for identical pages."""
+    from google.genai import types
+
+    key = hashlib.sha256(chunk_bytes).hexdigest()
+    with _chunk_cache_lock:
+        if key in _chunk_cache:
+            _chunk_cache.move_to_end(key)
+            print(f"♻️  Pages {first_page}-{last_page}: cached partial summary")
+            return _chunk_cache[key]
+
+    response = _generate_content(
+        "summarize_chunk",
+        contents=[
+            types.Part.from_bytes(
+                data=chunk_bytes,
+                mime_type="application/pdf",
+            ),
+            (
+                f"These are pages {first_page}-{last_page} of a longer document. "
+                "Write a detailed summary of the key concepts, main ideas, important facts, "
+                "definitions, and any formulas or processes on these pages. "
+                "Be thorough -- this summary will be used to generate quiz questions. "
+                "Respond with the summary text only."
+            ),
+        ],
+        hedge=False,
+        timeout=SUMMARY_TIMEOUT,
+    )
+    if not response.text:
+        raise ValueError(f"Gemini API returned empty summary for pages {first_page}-{last_page}")
+
+    summary = str(response.text).strip()
+    with _chunk_cache_lock:
+        _chunk_cache[key] = summary
+        while len(_chunk_cache) > CHUNK_CACHE_SIZE:
+            _chunk_cache.popitem(last=False)
+    print(f"✅ Pages {first_page}-{last_page}: summarized ({len(summary)} chars)")
+    return summary
+
+
+def _summarize_map_reduce(chunks: list[tuple[int, int, bytes]], progress=None) -> dict:
+    """Summarize page ranges concurrently, then merge them into one summary + concept."""
+    from google.genai import types
+
+    print(f"🗺️  Map-reduce summarization: {chunks[-1][1]} pages in {len(chunks)} sections")
+    partials = [None] * len(chunks)
+    completed = 0
+
+    pool = ThreadPoolExecutor(max_workers=SUMMARY_CONCURRENCY, thread_name_prefix="summarize")
+    try:
+        futures = {pool.submit(_summarize_chunk, *chunk): i for i, chunk in enumerate(chunks)}
+        for future in as_completed(futures):
+            partials[futures[future]] = future.result()
+            completed += 1
+            if progress:
+                progress(f"summarized {completed}/{len(chunks)} sections")
+    except BaseException:
+        # One section failed, so the job has failed: drop the sections not
+        # yet started instead of waiting for (and paying for) all of them
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+    if progress:
+        progress("merging section summaries")
+
+    sections = "\n\n".join(
+        f"Pages {first}-{last}:\n{partial}"
+        for (first, last, _), partial in zip(chunks, partials)
+    )
+    response = _generate_content(
+        "summarize_reduce",
+        contents=f"""These are summaries of consecutive sections of one document.
+
+{sections}
+
+{_SUMMARY_PROMPT}""",
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json",
+        ),
+        hedge=False,
+        timeout=SUMMARY_TIMEOUT,
+    )
+    if not response.text:
+        raise ValueError("Gemini API returned empty response")
+
+    return json.loads(str(response.text))
+
+
 def extract_concept_from_summary(summary: str) -> str:
     """Extract the main concept/topic from the summary."""
     try:
-        response = get_client().models.generate_content(
-            model=MODEL,
+        response = _generate_content(
+            "extract_concept",
             contents=f"""Analyze this summary and identify the MAIN concept or topic in 2-5 words.
 
 Summary:
@@ -117,9 +412,11 @@ def analyze_content_type(summary: str) -> dict:
     Analyze the PDF content to determine optimal question distribution.
     Returns ratio of multiple choice vs open-ended questions.
     """
+    from google.genai import types
+
     try:
-        response = get_client().models.generate_content(
-            model=MODEL,
+        response = _generate_content(
+            "analyze_content",
             contents=f"""Analyze this educational content and determine the optimal question format distribution.
 
 Content:
@@ -234,9 +531,11 @@ Return ONLY valid JSON (no markdown, no code blocks):
 Summary:
 {summary}"""
 
+    from google.genai import types
+
     try:
-        response = get_client().models.generate_content(
-            model=MODEL,
+        response = _generate_content(
+            "generate_questions",
             contents=prompt,
             config=types.GenerateContentConfig(
                 response_mime_type="application/json",
@@ -303,9 +602,11 @@ Return ONLY a JSON object:
   "original_question_id": {original_question['id']}
 }}"""
 
+    from google.genai import types
+
     try:
-        response = get_client().models.generate_content(
-            model=MODEL,
+        response = _generate_content(
+            "variation",
             contents=prompt,
             config=types.GenerateContentConfig(
                 response_mime_type="application/json",
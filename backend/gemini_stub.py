@@ -0,0 +1,71 @@
+"""Stand-in for Gemini used when replaying captured traffic.
+
+When GEMINI_STUB_TRACE points at a capture file (see traffic_recorder.py),
+_generate_content in gemini_service calls generate() here instead of the
+API. Each call sleeps for a latency drawn from the recorded calls of the
+same operation and returns a canned response of the right shape.
+"""
+import json
+import os
+import random
+import time
+from collections import defaultdict
+
+STUB_TRACE = os.environ.get("GEMINI_STUB_TRACE")
+DEFAULT_LATENCY_MS = 1000.0
+
+_latencies = None
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def enabled() -> bool:
+    return bool(STUB_TRACE)
+
+
+def _load_latencies() -> dict:
+    latencies = defaultdict(list)
+    with open(STUB_TRACE) as f:
+        for line in f:
+            record = json.loads(line)
+            if "u" in record:
+                latencies[record["u"]].append(record["ms"])
+    print(f"🧪 Gemini stub loaded latencies for: {', '.join(sorted(latencies)) or 'nothing'}")
+    return latencies
+
+
+def _sample_latency(op: str) -> float:
+    global _latencies
+    if _latencies is None:
+        _latencies = _load_latencies()
+    samples = _latencies.get(op) or [ms for values in _latencies.values() for ms in values]
+    return (random.choice(samples) if samples else DEFAULT_LATENCY_MS) / 1000
+
+
+def generate(op: str, contents) -> StubResponse:
+    time.sleep(_sample_latency(op))
+
+    if op in ("summarize", "summarize_reduce"):
+        return StubResponse(json.dumps({"summary": "Replay summary. " * 200, "concept": "Replay Concept"}))
+    if op == "summarize_chunk":
+        return StubResponse("Replay section summary. " * 50)
+    if op == "extract_concept":
+        return StubResponse("Replay Concept")
+    if op == "analyze_content":
+        return StubResponse(json.dumps({
+            "multiple_choice_ratio": 0.5,
+            "open_ended_ratio": 0.5,
+            "reasoning": "stub",
+        }))
+    if op == "generate_questions":
+        from gemini_service import generate_fallback_questions
+        return StubResponse(json.dumps(generate_fallback_questions("Replay Concept", 5, 5)))
+    if op == "variation":
+        from gemini_service import generate_fallback_questions
+        variation = generate_fallback_questions("Replay Concept", 0, 1)[0]
+        variation["is_variation"] = True
+        return StubResponse(json.dumps(variation))
+    return StubResponse("OK")
@@ -1,5 +1,15 @@
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from scheduler import required_threads
 
 bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
 workers = 1
+# Threads let the request scheduler (scheduler.py) prioritise interactive
+# detection over slow generation/upload calls within the single worker.
+# One thread per running or queued request the scheduler can admit, so a
+# burst in one class can't exhaust the pool before the scheduler sees it.
+worker_class = "gthread"
+threads = required_threads()
 timeout = 120
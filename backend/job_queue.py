@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+DB_PATH = os.environ.get(
+    "JOB_DB_PATH", os.path.join(os.path.dirname(__file__), "jobs.sqlite3")
+)
+NUM_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+POLL_INTERVAL = 0.5  # seconds between checks for new work when idle
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_hash ON jobs (kind, content_hash);
+"""
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class JobQueue:
+    """Durable local work queue backed by SQLite, drained by a thread pool.
+
+    Jobs survive restarts: anything left ``running`` when the process died
+    is put back on the queue at startup. Submitting content whose hash
+    matches a queued, running or finished job returns that job instead of
+    doing the work twice.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, num_workers: int = NUM_WORKERS):
+        self.db_path = db_path
+        self.num_workers = num_workers
+        self._handlers = {}
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._workers = []
+
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            requeued = conn.execute(
+                "UPDATE jobs SET status = ?, progress = ?, updated_at = ? WHERE status = ?",
+                (QUEUED, "requeued after restart", time.time(), RUNNING),
+            ).rowcount
+        if requeued:
+            print(f"♻️  Requeued {requeued} interrupted job(s)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def register(self, kind: str, handler) -> None:
+        """Register ``handler(payload, report_progress) -> dict`` for a job kind."""
+        self._handlers[kind] = handler
+
+    def start(self) -> None:
+        """Start the worker pool (idempotent)."""
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._work_loop, name=f"job-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+        print(f"🧵 Started {self.num_workers} job worker(s)")
+
+    def submit(self, kind: str, content_hash: str, payload: dict) -> tuple[dict, bool]:
+        """Enqueue a job, or return the existing one for the same content.
+
+        Returns ``(job, created)``. Failed jobs are not reused, so a retry
+        after an error gets a fresh attempt.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = conn.execute(
+                    "SELECT * FROM jobs WHERE kind = ? AND content_hash = ? AND status != ? "
+                    "ORDER BY created_at DESC LIMIT 1",
+                    (kind, content_hash, FAILED),
+                ).fetchone()
+                if existing:
+                    conn.execute("COMMIT")
+                    return _row_to_job(existing), False
+
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, content_hash, payload, status, progress, "
+                    "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, content_hash, json.dumps(payload), QUEUED, "queued", now, now),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        self._wakeup.set()
+        return self.get(job_id), True
+
+    def get(self, job_id: str) -> dict | None:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def _claim(self) -> sqlite3.Row | None:
+        """Atomically move the oldest queued job to running."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, progress = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, "started", time.time(), row["id"]),
+                )
+            conn.execute("COMMIT")
+        return row
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def _work_loop(self) -> None:
+        while True:
+            row = self._claim()
+            if row is None:
+                self._wakeup.wait(POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+
+            job_id = row["id"]
+            handler = self._handlers.get(row["kind"])
+            if handler is None:
+                self._update(job_id, status=FAILED, error=f"No handler for job kind '{row['kind']}'")
+                continue
+
+            def report_progress(message: str, job_id=job_id) -> None:
+                self._update(job_id, progress=message)
+
+            try:
+                result = handler(json.loads(row["payload"]), report_progress)
+                self._update(job_id, status=DONE, progress="done", result=json.dumps(result))
+            except Exception as e:
+                import traceback
+                print(f"❌ Job {job_id} failed: {e}")
+                traceback.print_exc()
+                self._update(job_id, status=FAILED, progress="failed", error=str(e))
+
+
+def _row_to_job(row: sqlite3.Row) -> dict:
+    return {
+        "job_id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "progress": row["progress"],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
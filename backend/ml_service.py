@@ -1,38 +1,104 @@
-from sentence_transformers import SentenceTransformer, CrossEncoder, util
+import math
+import os
+import threading
 
-# Lazy-loaded models — only initialized on first use to reduce startup memory
+# sentence_transformers (and torch) are imported inside the loaders below so
+# importing this module doesn't pay seconds of import time up front.
+
+# Lazy-loaded models — only initialized on first use to reduce startup memory.
+# Each loader holds its own lock so concurrent first requests (gunicorn runs
+# threaded) load a model once instead of once per thread.
 _similarity_model = None
+_similarity_lock = threading.Lock()
 _nli_model = None
+_nli_lock = threading.Lock()
+_small_nli_model = None
+_small_nli_lock = threading.Lock()
+_collusion_index = None
+_collusion_lock = threading.Lock()
 
 NLI_LABELS = ["contradiction", "entailment", "neutral"]
 MEMORIZATION_THRESHOLD = 0.85
 
+NLI_MODEL = "cross-encoder/nli-deberta-v3-base"
+# Distilled NLI cross-encoder with the same label order as NLI_MODEL
+SMALL_NLI_MODEL = "cross-encoder/nli-MiniLM2-L6-H768"
+
+# "full" always runs NLI_MODEL; "cascade" tries SMALL_NLI_MODEL first and only
+# escalates when its top-label probability margin is below CASCADE_MARGIN.
+NLI_MODE = os.environ.get("NLI_MODE", "full")
+CASCADE_MARGIN = float(os.environ.get("NLI_CASCADE_MARGIN", "0.3"))
+
 
 def _get_similarity_model():
     global _similarity_model
-    if _similarity_model is None:
-        print("Loading similarity model...")
-        _similarity_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+    with _similarity_lock:
+        if _similarity_model is None:
+            from sentence_transformers import SentenceTransformer
+            print("Loading similarity model...")
+            _similarity_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
     return _similarity_model
 
 
 def _get_nli_model():
     global _nli_model
-    if _nli_model is None:
-        print("Loading NLI model...")
-        _nli_model = CrossEncoder("cross-encoder/nli-deberta-v3-base")
+    with _nli_lock:
+        if _nli_model is None:
+            from sentence_transformers import CrossEncoder
+            print("Loading NLI model...")
+            _nli_model = CrossEncoder(NLI_MODEL)
     return _nli_model
 
 
-def check_similarity(student_answer: str, pdf_summary: str) -> dict:
+def _get_small_nli_model():
+    global _small_nli_model
+    with _small_nli_lock:
+        if _small_nli_model is None:
+            from sentence_transformers import CrossEncoder
+            print("Loading small NLI model...")
+            _small_nli_model = CrossEncoder(SMALL_NLI_MODEL)
+    return _small_nli_model
+
+
+def _top_margin(scores) -> float:
+    """Gap between the two most likely labels after a softmax over the logits."""
+    peak = max(float(s) for s in scores)
+    exps = [math.exp(float(s) - peak) for s in scores]
+    total = sum(exps)
+    probs = sorted((e / total for e in exps), reverse=True)
+    return probs[0] - probs[1]
+
+
+def _nli_result(scores, stage: str) -> dict:
+    return {
+        "label": NLI_LABELS[scores.argmax()],
+        "scores": {
+            label: round(float(s), 4)
+            for label, s in zip(NLI_LABELS, scores)
+        },
+        "stage": stage,
+        "margin": round(_top_margin(scores), 4),
+    }
+
+
+def embed_answer(text: str):
+    """L2-normalised embedding of an answer (numpy float32 vector)."""
+    return _get_similarity_model().encode(text, normalize_embeddings=True)
+
+
+def check_similarity(student_answer: str, pdf_summary: str, answer_embedding=None) -> dict:
     """Compare student answer against PDF summary to detect memorization.
 
     Returns a dict with the cosine similarity score and a memorization flag.
     High similarity (>0.85) suggests the student is copying from the source.
+    Pass ``answer_embedding`` (from embed_answer) to avoid re-encoding the answer.
     """
+    from sentence_transformers import util
+
     model = _get_similarity_model()
-    answer_embedding = model.encode(student_answer, convert_to_tensor=True)
-    summary_embedding = model.encode(pdf_summary, convert_to_tensor=True)
+    if answer_embedding is None:
+        answer_embedding = model.encode(student_answer, normalize_embeddings=True)
+    summary_embedding = model.encode(pdf_summary, normalize_embeddings=True)
 
     score = util.cos_sim(answer_embedding, summary_embedding).item()
 
@@ -42,24 +108,72 @@ def check_similarity(student_answer: str, pdf_summary: str) -> dict:
     }
 
 
-def check_correctness(student_answer: str, sample_answer: str) -> dict:
+def check_collusion(question_key: str, answer_id, student_id, answer_embedding) -> dict:
+    """Find other students' earlier answers to the same question that are
+    near-duplicates of this one, then index this answer.
+
+    Returns the matches (answer id, student id, cosine score) above the
+    collusion threshold along with how many answers were searched.
+    """
+    global _collusion_index
+    with _collusion_lock:
+        if _collusion_index is None:
+            from collusion_index import CollusionIndex
+            _collusion_index = CollusionIndex()
+    return _collusion_index.check_and_add(question_key, answer_id, student_id, answer_embedding)
+
+
+def check_correctness(student_answer: str, sample_answer: str, mode: str | None = None) -> dict:
     """Check if the student's answer is correct using NLI.
 
     Compares (sample_answer, student_answer) — if the student's answer
     is entailed by the sample answer, it is considered correct.
 
-    Returns a dict with the predicted label and all three NLI scores.
+    In cascade mode the small model decides when it is confident, and the
+    full model only runs for close calls. Returns a dict with the predicted
+    label, all three NLI scores, the stage that decided ("small" or "full")
+    and that stage's top-label margin.
     """
-    model = _get_nli_model()
-    scores = model.predict([(sample_answer, student_answer)])[0]
+    mode = mode or NLI_MODE
+    pair = [(sample_answer, student_answer)]
 
-    score_dict = {
-        label: round(float(s), 4)
-        for label, s in zip(NLI_LABELS, scores)
-    }
-    predicted_label = NLI_LABELS[scores.argmax()]
+    if mode == "cascade":
+        scores = _get_small_nli_model().predict(pair)[0]
+        if _top_margin(scores) >= CASCADE_MARGIN:
+            return _nli_result(scores, "small")
 
-    return {
-        "label": predicted_label,
-        "scores": score_dict,
-    }
+    scores = _get_nli_model().predict(pair)[0]
+    return _nli_result(scores, "full")
+
+
+def evaluate_cascade(pairs: list[tuple[str, str]], thresholds: list[float], batch_size: int = 32) -> list[dict]:
+    """Offline comparison of cascade mode against full-model-only scoring.
+
+    ``pairs`` are (sample_answer, student_answer) tuples. Both models score
+    every pair once; each threshold is then simulated from those scores.
+    Returns, per threshold, the escalation rate and the fraction of pairs
+    where the cascade label matches the full model's label.
+    """
+    small_scores = _get_small_nli_model().predict(pairs, batch_size=batch_size)
+    full_scores = _get_nli_model().predict(pairs, batch_size=batch_size)
+
+    small_labels = [NLI_LABELS[s.argmax()] for s in small_scores]
+    full_labels = [NLI_LABELS[s.argmax()] for s in full_scores]
+    margins = [_top_margin(s) for s in small_scores]
+
+    reports = []
+    for threshold in thresholds:
+        escalated = agreed = 0
+        for small, full, margin in zip(small_labels, full_labels, margins):
+            if margin < threshold:
+                escalated += 1
+                agreed += 1
+            elif small == full:
+                agreed += 1
+        reports.append({
+            "threshold": threshold,
+            "pairs": len(pairs),
+            "escalation_rate": round(escalated / len(pairs), 4) if pairs else 0.0,
+            "agreement": round(agreed / len(pairs), 4) if pairs else 0.0,
+        })
+    return reports
@@ -0,0 +1,329 @@
+"""Replay captured traffic against a local backend for capacity planning.
+
+Reads a capture file written by traffic_recorder.py, starts the backend
+under gunicorn with Gemini stubbed (latencies drawn from the recorded
+distribution, see gemini_stub.py), and re-issues the recorded requests
+with synthetic payloads of the same shape at each requested speed-up.
+Sampled captures are compressed by their sample rate, so 1x replays the
+original request rate rather than the sampled one.
+Reports per-route latency percentiles, errors and 503 load shedding, and
+the first speed at which the backend saturates.
+
+Usage:
+    python replay_traffic.py traffic.jsonl
+    python replay_traffic.py traffic.jsonl --speeds 1,2,4,8
+    python replay_traffic.py traffic.jsonl --url http://localhost:5001
+"""
+import argparse
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# A route counts as saturated when it sheds more than this fraction of
+# requests, or its p95 grows by this factor over the first (slowest) run.
+# Baselines under SATURATION_MIN_P95_MS are raised to it to ignore jitter
+# on very fast routes.
+SATURATION_SHED_RATE = 0.01
+SATURATION_P95_FACTOR = 2.0
+SATURATION_MIN_P95_MS = 50.0
+
+# Idle stretches in the capture (nights, deploys) longer than this many
+# seconds are shortened to it so a replay doesn't sit waiting through them.
+DEFAULT_MAX_GAP = 60.0
+
+_PATH_PARAM = re.compile(r"<(?:(\w+):)?(\w+)>")
+
+
+def load_trace(path: str, max_gap: float = DEFAULT_MAX_GAP) -> list[dict]:
+    """Request records in arrival order, each with a replay offset ``o``.
+
+    ``o`` is seconds since the first request at the original request rate:
+    each gap is multiplied by the record's sample rate (a 10% capture sees
+    a tenth of the requests, so they are replayed ten times closer), then
+    shortened to ``max_gap``.
+    """
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    requests = [r for r in records if "r" in r and r["r"] != "<unmatched>" and not r["r"].endswith("/events")]
+    requests.sort(key=lambda r: r["t"])
+
+    offset = 0.0
+    for prev, record in zip([None] + requests, requests):
+        if prev is not None:
+            offset += min((record["t"] - prev["t"]) * sample_rate(record), max_gap)
+        record["o"] = offset
+    return requests
+
+
+def sample_rate(record: dict) -> float:
+    # Captures from before the rate was recorded were always unsampled
+    return record.get("sr", 1.0)
+
+
+def synthesize(shape):
+    """Build a payload with the recorded shape (strings of the recorded length)."""
+    if isinstance(shape, dict):
+        return {key: synthesize(item) for key, item in shape.items()}
+    if isinstance(shape, list):
+        size, item = shape
+        return [synthesize(item) for _ in range(size)]
+    if isinstance(shape, int):
+        return ("lorem ipsum " * (shape // 12 + 1))[:shape]
+    if isinstance(shape, str) and shape.startswith("="):
+        return shape[1:]
+    if shape == "n":
+        return random.randint(1, 10)
+    if shape == "b":
+        return random.random() < 0.5
+    return None
+
+
+def fake_pdf(size: int) -> bytes:
+    """Minimal valid one-page PDF padded to roughly ``size`` bytes.
+
+    A random nonce keeps uploads from being deduplicated by content hash.
+    """
+    body = (
+        b"%PDF-1.4\n"
+        b"1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+        b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+        b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]>>endobj\n"
+        b"trailer<</Root 1 0 R>>\n"
+    )
+    padding = max(0, size - len(body) - 64)
+    return body + b"%" + uuid.uuid4().hex.encode() + b"\n%" + b"x" * padding + b"\n%%EOF\n"
+
+
+class Replayer:
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.job_ids = []
+        self._lock = threading.Lock()
+
+    def _path(self, rule: str) -> str:
+        def fill(match):
+            converter, name = match.groups()
+            if name == "job_id":
+                with self._lock:
+                    return self.job_ids[-1] if self.job_ids else uuid.uuid4().hex
+            if converter == "int":
+                return str(random.randint(1, 10**9))
+            return uuid.uuid4().hex
+        return _PATH_PARAM.sub(fill, rule)
+
+    def send(self, record: dict) -> tuple[int, float]:
+        url = self.base_url + self._path(record["r"])
+        shape = record.get("p")
+        headers = {}
+        data = None
+
+        if isinstance(shape, dict) and "files" in shape:
+            boundary = uuid.uuid4().hex
+            parts = []
+            for field, size in shape["files"].items():
+                parts.append(
+                    f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; "
+                    f"filename=\"replay.pdf\"\r\nContent-Type: application/pdf\r\n\r\n".encode()
+                    + fake_pdf(size) + b"\r\n"
+                )
+            data = b"".join(parts) + f"--{boundary}--\r\n".encode()
+            headers["Content-Type"] = f"multipart/form-data; boundary={boundary}"
+        elif record["m"] != "GET" and shape is not None:
+            data = json.dumps(synthesize(shape)).encode()
+            headers["Content-Type"] = "application/json"
+
+        req = urllib.request.Request(url, data=data, headers=headers, method=record["m"])
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=300) as response:
+                body = response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            status = e.code
+        except Exception:
+            return 0, time.perf_counter() - start
+        elapsed = time.perf_counter() - start
+
+        if record["r"] == "/api/upload-reference" and status in (200, 202):
+            job_id = json.loads(body).get("job_id")
+            if job_id:
+                with self._lock:
+                    self.job_ids.append(job_id)
+        return status, elapsed
+
+    def run(self, records: list[dict], speed: float, max_workers: int) -> dict:
+        """Issue every record at its replay offset divided by ``speed``."""
+        results = defaultdict(list)
+        start = time.perf_counter()
+
+        def fire(record):
+            status, elapsed = self.send(record)
+            results[record["r"]].append((status, elapsed))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for record in records:
+                delay = record["o"] / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(fire, record)
+
+        return {"duration": time.perf_counter() - start, "routes": dict(results)}
+
+
+def summarize_run(run: dict) -> dict:
+    routes = {}
+    for route, samples in sorted(run["routes"].items()):
+        latencies = sorted(elapsed * 1000 for _, elapsed in samples)
+        statuses = [status for status, _ in samples]
+
+        def pct(q):
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 1)
+
+        routes[route] = {
+            "count": len(samples),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": round(latencies[-1], 1),
+            "shed_rate": round(statuses.count(503) / len(statuses), 4),
+            "error_rate": round(sum(1 for s in statuses if s == 0 or (s >= 500 and s != 503)) / len(statuses), 4),
+        }
+    total = sum(r["count"] for r in routes.values())
+    return {"throughput_rps": round(total / run["duration"], 2), "routes": routes}
+
+
+def saturated_routes(summary: dict, baseline: dict) -> list[str]:
+    routes = []
+    for route, stats in summary["routes"].items():
+        base = baseline["routes"].get(route)
+        if stats["shed_rate"] > SATURATION_SHED_RATE:
+            routes.append(route)
+        elif base and stats["p95_ms"] > SATURATION_P95_FACTOR * max(base["p95_ms"], SATURATION_MIN_P95_MS):
+            routes.append(route)
+    return routes
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_backend(trace_path: str, workdir: str) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        GEMINI_STUB_TRACE=os.path.abspath(trace_path),
+        JOB_DB_PATH=os.path.join(workdir, "jobs.sqlite3"),
+    )
+    env.pop("TRAFFIC_CAPTURE_PATH", None)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py", "app:app"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("Backend exited during startup")
+        try:
+            urllib.request.urlopen(url + "/api/health", timeout=2)
+            return proc, url
+        except Exception:
+            time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("Backend did not become healthy within 120s")
+
+
+def print_summary(speed: float, summary: dict, saturated: list[str]) -> None:
+    print(f"\n⏩ {speed:g}x  ({summary['throughput_rps']} req/s)")
+    print(f"{'route':<42} {'count':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'shed':>6} {'err':>6}")
+    for route, s in summary["routes"].items():
+        flag = "  ⚠️" if route in saturated else ""
+        print(
+            f"{route:<42} {s['count']:>6} {s['p50_ms']:>8} {s['p95_ms']:>8} {s['p99_ms']:>8} "
+            f"{s['shed_rate']:>6.1%} {s['error_rate']:>6.1%}{flag}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace")
+    parser.add_argument("--speeds", default="1", help="comma-separated replay speed-ups, e.g. 1,2,4,8")
+    parser.add_argument("--url", help="replay against an already running backend instead of starting one")
+    parser.add_argument("--max-workers", type=int, default=256, help="client-side concurrency cap")
+    parser.add_argument("--json", help="also write the full report to this file")
+    parser.add_argument(
+        "--max-gap", type=float, default=DEFAULT_MAX_GAP,
+        help=f"shorten idle gaps in the capture to this many seconds (default {DEFAULT_MAX_GAP:g})",
+    )
+    args = parser.parse_args()
+
+    records = load_trace(args.trace, args.max_gap)
+    if not records:
+        print("❌ No requests found in trace", file=sys.stderr)
+        return 1
+    speeds = sorted(float(s) for s in args.speeds.split(","))
+    print(f"📼 Replaying {len(records)} requests at {', '.join(f'{s:g}x' for s in speeds)}")
+    rates = {sample_rate(r) for r in records}
+    mean_rate = sum(sample_rate(r) for r in records) / len(records)
+    if len(rates) > 1:
+        print(f"⚠️  Trace mixes sample rates {sorted(rates)}; each segment is scaled by its own rate")
+    elif mean_rate < 1:
+        print(f"🎚️  Trace sampled at {mean_rate:.0%}; replaying at {1 / mean_rate:g}x the captured request rate")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        proc = None
+        url = args.url
+        if url is None:
+            proc, url = start_backend(args.trace, workdir)
+        try:
+            replayer = Replayer(url)
+            report = []
+            baseline = None
+            saturation_point = None
+            for speed in speeds:
+                summary = summarize_run(replayer.run(records, speed, args.max_workers))
+                baseline = baseline or summary
+                saturated = saturated_routes(summary, baseline)
+                if saturated and saturation_point is None:
+                    saturation_point = speed
+                print_summary(speed, summary, saturated)
+                report.append({"speed": speed, "saturated_routes": saturated, **summary})
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(timeout=30)
+
+    if saturation_point is None:
+        print(f"\n✅ No saturation up to {speeds[-1]:g}x")
+    else:
+        print(f"\n📈 Saturation first reached at {saturation_point:g}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"saturation_point": saturation_point, "sample_rate": round(mean_rate, 4), "runs": report},
+                f, indent=2,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
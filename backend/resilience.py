@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+# Closed: calls go through. Open: calls fail fast while a background probe
+# checks for recovery.
+CLOSED = "closed"
+OPEN = "open"
+
+
+# How often hedged_call checks whether a queued attempt has started
+QUEUE_POLL_INTERVAL = 0.05
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+
+class PoolSaturatedError(Exception):
+    """Raised when a call never got a local worker thread to run on."""
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies, used to pick the hedge delay."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20, default_delay: float = 15.0):
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def hedge_delay(self) -> float:
+        """p95 latency once we have enough samples, otherwise the default."""
+        with self._lock:
+            enough = len(self._samples) >= self.min_samples
+        return self.percentile(0.95) if enough else self.default_delay
+
+
+class CircuitBreaker:
+    """Trips after ``failure_threshold`` consecutive failures.
+
+    While open, ``before_call`` raises ``CircuitOpenError`` immediately and a
+    background thread runs ``probe`` every ``probe_interval`` seconds; the
+    first successful probe closes the circuit again.
+    """
+
+    def __init__(self, name: str, probe, failure_threshold: int = 5, probe_interval: float = 10.0):
+        self.name = name
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.state = CLOSED
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        if self.state == OPEN:
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == OPEN or self._failures < self.failure_threshold:
+                return
+            self.state = OPEN
+        print(f"🔌 {self.name} circuit opened after {self.failure_threshold} consecutive failures")
+        threading.Thread(target=self._probe_loop, name=f"{self.name}-probe", daemon=True).start()
+
+    def _probe_loop(self) -> None:
+        while True:
+            time.sleep(self.probe_interval)
+            try:
+                self.probe()
+            except Exception as e:
+                print(f"🔌 {self.name} probe failed: {e}")
+                continue
+            with self._lock:
+                self.state = CLOSED
+                self._failures = 0
+            print(f"🔌 {self.name} circuit closed, probe succeeded")
+            return
+
+
+def hedged_call(fn, executor, hedge_delay: float | None, timeout: float, queue_timeout: float | None = None):
+    """Run ``fn`` and, if it hasn't answered after ``hedge_delay`` seconds,
+    start a duplicate. The first successful result wins.
+
+    ``timeout`` counts from when the first attempt actually starts running,
+    not from when it was queued on ``executor``. If no attempt has started
+    within ``queue_timeout`` (default: ``timeout``) seconds, raises
+    ``PoolSaturatedError``, which is a local condition rather than an
+    upstream failure. Otherwise raises the last error if every attempt
+    fails, or ``TimeoutError`` if nothing succeeds in time. Pass
+    ``hedge_delay=None`` to only apply the timeouts.
+    """
+    queue_deadline = time.monotonic() + (timeout if queue_timeout is None else queue_timeout)
+    start_times = []
+
+    def attempt():
+        start_times.append(time.monotonic())
+        return fn()
+
+    pending = {executor.submit(attempt)}
+    hedged = hedge_delay is None
+    last_error = None
+
+    while pending:
+        now = time.monotonic()
+        if not start_times:
+            if now >= queue_deadline:
+                for future in pending:
+                    future.cancel()
+                raise PoolSaturatedError("No worker thread free to make the call")
+            # Poll so we notice when the attempt starts and its timeout begins
+            wait_for = min(queue_deadline - now, QUEUE_POLL_INTERVAL)
+        else:
+            deadline = start_times[0] + timeout
+            if now >= deadline:
+                break
+            wait_for = deadline - now
+            if not hedged:
+                hedge_at = start_times[0] + hedge_delay
+                if now >= hedge_at:
+                    # Still waiting on the first attempt past the hedge delay
+                    pending.add(executor.submit(attempt))
+                    hedged = True
+                else:
+                    wait_for = min(wait_for, hedge_at - now)
+
+        done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return future.result()
+            last_error = future.exception()
+
+    for future in pending:
+        future.cancel()
+    if last_error is not None and not pending:
+        raise last_error
+    raise TimeoutError(f"No response within {timeout:g}s")
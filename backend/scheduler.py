@@ -0,0 +1,270 @@
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+from flask import jsonify, make_response
+
+# Request classes, highest priority first. Lower number = served first.
+INTERACTIVE = "interactive"
+GENERATION = "generation"
+UPLOAD = "upload"
+STREAM = "stream"  # long-lived responses such as job event streams
+
+PRIORITIES = {
+    INTERACTIVE: 0,
+    GENERATION: 1,
+    UPLOAD: 2,
+    STREAM: 3,
+}
+
+# Per-class concurrency limits and queue depths (override via env vars).
+# Queued requests block a server thread while they wait; gunicorn_config
+# sizes the thread pool with required_threads() so they never take the
+# threads /detect needs.
+CLASS_LIMITS = {
+    INTERACTIVE: int(os.environ.get("SCHED_INTERACTIVE_CONCURRENCY", "4")),
+    GENERATION: int(os.environ.get("SCHED_GENERATION_CONCURRENCY", "2")),
+    UPLOAD: int(os.environ.get("SCHED_UPLOAD_CONCURRENCY", "1")),
+    STREAM: int(os.environ.get("SCHED_STREAM_CONCURRENCY", "2")),
+}
+QUEUE_DEPTHS = {
+    INTERACTIVE: int(os.environ.get("SCHED_INTERACTIVE_QUEUE", "8")),
+    GENERATION: int(os.environ.get("SCHED_GENERATION_QUEUE", "4")),
+    UPLOAD: int(os.environ.get("SCHED_UPLOAD_QUEUE", "2")),
+    STREAM: int(os.environ.get("SCHED_STREAM_QUEUE", "0")),
+}
+# Total requests allowed to run at once across all classes except STREAM.
+# Smaller than the sum of the class limits, so classes compete for slots and
+# priority decides who gets the next one; larger than the non-interactive
+# limits combined, so /detect always has a slot of its own.
+TOTAL_SLOTS = int(os.environ.get("SCHED_TOTAL_SLOTS", "5"))
+# Streams hold their slot for as long as the client listens, so they have
+# only their own limit and don't take slots from the shared budget.
+UNSHARED_CLASSES = {STREAM}
+# Threads for routes that bypass the scheduler (health, metrics, CORS preflight)
+UNSCHEDULED_THREADS = 2
+# Longest a request may wait in the queue before being shed
+MAX_QUEUE_WAIT = float(os.environ.get("SCHED_MAX_QUEUE_WAIT", "30"))
+# Number of recent queue waits kept per class for percentile metrics
+WAIT_SAMPLES = 500
+
+
+class QueueFullError(Exception):
+    """Raised when a request cannot be admitted and should be shed."""
+
+    def __init__(self, request_class: str, retry_after: int):
+        super().__init__(f"{request_class} queue is full")
+        self.request_class = request_class
+        self.retry_after = retry_after
+
+
+class RequestScheduler:
+    """Admission control with per-class concurrency limits and priority queues.
+
+    A request acquires a slot before its handler runs. If its class is at its
+    concurrency limit (or all slots are busy) it waits in a priority queue;
+    when a slot frees up, the highest-priority waiter whose class has spare
+    capacity is admitted first. Requests are shed immediately when their
+    class queue is full, or after waiting longer than ``max_wait``.
+    Classes in UNSHARED_CLASSES only count against their own limit.
+    """
+
+    def __init__(self, limits: dict, queue_depths: dict, total_slots: int, max_wait: float):
+        # Classes missing from the config get no slots (always shed)
+        self.limits = {name: limits.get(name, 0) for name in PRIORITIES}
+        self.queue_depths = {name: queue_depths.get(name, 0) for name in PRIORITIES}
+        self.total_slots = total_slots
+        self.max_wait = max_wait
+
+        self._cond = threading.Condition()
+        self._running = {name: 0 for name in PRIORITIES}
+        self._queued = {name: 0 for name in PRIORITIES}
+        self._waiters = []  # heap of (priority, seq, request_class)
+        self._seq = itertools.count()
+
+        self._waits = {name: deque(maxlen=WAIT_SAMPLES) for name in PRIORITIES}
+        self._durations = {name: deque(maxlen=WAIT_SAMPLES) for name in PRIORITIES}
+        self._admitted = {name: 0 for name in PRIORITIES}
+        self._shed = {name: 0 for name in PRIORITIES}
+
+    def _has_capacity(self, request_class: str) -> bool:
+        if self._running[request_class] >= self.limits[request_class]:
+            return False
+        if request_class in UNSHARED_CLASSES:
+            return True
+        shared = sum(n for name, n in self._running.items() if name not in UNSHARED_CLASSES)
+        return shared < self.total_slots
+
+    def _next_admissible(self):
+        """Return the heap entry of the highest-priority waiter that can run now."""
+        for entry in sorted(self._waiters):
+            if self._has_capacity(entry[2]):
+                return entry
+        return None
+
+    def _retry_after(self, request_class: str) -> int:
+        """Rough estimate of how long until the class queue drains, in seconds:
+        the class's recent average run time for each round of running and
+        queued requests. Before any have finished, falls back to ``max_wait``.
+        """
+        durations = self._durations[request_class]
+        if not durations:
+            return max(1, math.ceil(self.max_wait))
+        avg_duration = sum(durations) / len(durations)
+        rounds = (self._queued[request_class] + 1) / max(1, self.limits[request_class])
+        return max(1, math.ceil(avg_duration * rounds))
+
+    def acquire(self, request_class: str) -> float:
+        """Block until the request may run. Returns the time spent queued."""
+        start = time.monotonic()
+        with self._cond:
+            priority = PRIORITIES[request_class]
+            ahead = any(entry[0] <= priority for entry in self._waiters)
+            if not ahead and self._has_capacity(request_class):
+                self._running[request_class] += 1
+                self._record_wait(request_class, 0.0)
+                return 0.0
+
+            if self._queued[request_class] >= self.queue_depths[request_class]:
+                self._shed[request_class] += 1
+                raise QueueFullError(request_class, self._retry_after(request_class))
+
+            entry = (priority, next(self._seq), request_class)
+            heapq.heappush(self._waiters, entry)
+            self._queued[request_class] += 1
+            try:
+                deadline = start + self.max_wait
+                while self._next_admissible() != entry:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._shed[request_class] += 1
+                        raise QueueFullError(request_class, self._retry_after(request_class))
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._queued[request_class] -= 1
+                # Our departure may unblock someone behind us
+                self._cond.notify_all()
+
+            self._running[request_class] += 1
+            waited = time.monotonic() - start
+            self._record_wait(request_class, waited)
+            return waited
+
+    def release(self, request_class: str, duration: float | None = None) -> None:
+        """Free the request's slot. ``duration`` is how long it ran, in seconds."""
+        with self._cond:
+            self._running[request_class] -= 1
+            if duration is not None:
+                self._durations[request_class].append(duration)
+            self._cond.notify_all()
+
+    def _record_wait(self, request_class: str, waited: float) -> None:
+        self._admitted[request_class] += 1
+        self._waits[request_class].append(waited)
+
+    def stats(self) -> dict:
+        """Snapshot of queue depth, concurrency and queue wait times per class."""
+        with self._cond:
+            result = {}
+            for name in PRIORITIES:
+                waits = sorted(self._waits[name])
+                durations = sorted(self._durations[name])
+                result[name] = {
+                    "running": self._running[name],
+                    "queued": self._queued[name],
+                    "concurrency_limit": self.limits[name],
+                    "queue_depth": self.queue_depths[name],
+                    "admitted": self._admitted[name],
+                    "shed": self._shed[name],
+                    "queue_wait_ms": {
+                        "avg": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+                        "p50": _percentile_ms(waits, 0.50),
+                        "p95": _percentile_ms(waits, 0.95),
+                        "max": round(waits[-1] * 1000, 2) if waits else 0.0,
+                    },
+                    "run_time_ms": {
+                        "p50": _percentile_ms(durations, 0.50),
+                        "p95": _percentile_ms(durations, 0.95),
+                    },
+                }
+            return result
+
+
+def required_threads(
+    limits: dict = CLASS_LIMITS, queue_depths: dict = QUEUE_DEPTHS, total_slots: int = TOTAL_SLOTS
+) -> int:
+    """Server threads needed so every running or queued request has its own
+    thread, with spares for unscheduled routes. gunicorn_config sizes the
+    worker's thread pool with this, so the scheduler (not the thread pool)
+    is always where requests wait.
+    """
+    shared = sum(n for name, n in limits.items() if name not in UNSHARED_CLASSES)
+    unshared = sum(n for name, n in limits.items() if name in UNSHARED_CLASSES)
+    return min(shared, total_slots) + unshared + sum(queue_depths.values()) + UNSCHEDULED_THREADS
+
+
+def _percentile_ms(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return round(sorted_values[index] * 1000, 2)
+
+
+scheduler = RequestScheduler(CLASS_LIMITS, QUEUE_DEPTHS, TOTAL_SLOTS, MAX_QUEUE_WAIT)
+
+
+def scheduled(request_class: str):
+    """Route decorator that runs the handler under the scheduler.
+
+    Shed requests get a fast 503 with a ``Retry-After`` header. Admitted
+    requests carry their queue wait in an ``X-Queue-Wait-Ms`` header.
+    Streamed responses keep their slot until the stream closes.
+    """
+    if request_class not in PRIORITIES:
+        raise ValueError(f"Unknown request class: {request_class}")
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                waited = scheduler.acquire(request_class)
+            except QueueFullError as e:
+                print(f"⏳ Shedding {request_class} request (retry after {e.retry_after}s)")
+                response = jsonify({
+                    "error": "Server is busy, please retry shortly.",
+                    "request_class": request_class,
+                    "retry_after": e.retry_after,
+                })
+                response.status_code = 503
+                response.headers["Retry-After"] = str(e.retry_after)
+                return response
+
+            started = time.monotonic()
+            try:
+                # Normalise (body, status) tuples so we can attach the header
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                scheduler.release(request_class, time.monotonic() - started)
+                raise
+
+            if response.is_streamed:
+                # The body is produced after we return; hold the slot (and
+                # its thread) until the stream is closed.
+                response.call_on_close(
+                    lambda: scheduler.release(request_class, time.monotonic() - started)
+                )
+            else:
+                scheduler.release(request_class, time.monotonic() - started)
+            response.headers["X-Queue-Wait-Ms"] = f"{waited * 1000:.1f}"
+            return response
+
+        return wrapper
+
+    return decorator
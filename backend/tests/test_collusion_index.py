@@ -0,0 +1,78 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import collusion_index
+from collusion_index import CollusionIndex
+
+
+def _vec(seed: int, dim: int = 384) -> np.ndarray:
+    v = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+def _ids(result):
+    return [(m["answer_id"], m["student_id"]) for m in result["matches"]]
+
+
+def test_copied_answer_from_another_student_is_flagged():
+    index = CollusionIndex(threshold=0.9)
+    assert index.check_and_add("q", 1, "a", _vec(0))["matches"] == []
+    assert index.check_and_add("q", 2, "b", _vec(1))["matches"] == []
+
+    result = index.check_and_add("q", 3, "c", _vec(0))
+    assert result["is_suspected"]
+    assert _ids(result) == [(1, "a")]
+    assert result["checked_against"] == 2
+
+
+def test_same_student_resubmission_is_not_flagged():
+    index = CollusionIndex(threshold=0.9)
+    index.check_and_add("q", 1, "a", _vec(0))
+    assert index.check_and_add("q", 2, "a", _vec(0))["matches"] == []
+    # Without a trustworthy identity nothing but the answer itself is excluded
+    assert _ids(index.check_and_add("q", 3, None, _vec(0))) == [(1, "a"), (2, "a")]
+
+
+def test_redetecting_an_answer_does_not_match_itself_or_duplicate_it():
+    index = CollusionIndex(threshold=0.9)
+    index.check_and_add("q", 1, "a", _vec(0))
+    for student in ("b", None):
+        index.check_and_add("q", 2, student, _vec(0))
+        result = index.check_and_add("q", 2, student, _vec(0))
+        assert _ids(result) == [(1, "a")] + ([(2, "b")] if student is None else [])
+    assert len(index._indexes["q"]) == 3
+
+
+def test_shared_answer_id_from_two_students_keeps_both():
+    index = CollusionIndex(threshold=0.9)
+    index.check_and_add("q", 7, "a", _vec(0))
+
+    result = index.check_and_add("q", 7, "b", _vec(0))
+    assert _ids(result) == [(7, "a")]
+    assert _ids(index.check_and_add("q", 8, "c", _vec(0))) == [(7, "a"), (7, "b")]
+
+
+def test_matrix_grows_past_initial_capacity():
+    index = CollusionIndex(threshold=0.9)
+    n = collusion_index.INITIAL_CAPACITY * 3
+    for i in range(n):
+        index.check_and_add("q", i, f"s{i}", _vec(i))
+
+    result = index.check_and_add("q", n, "copier", _vec(5))
+    assert _ids(result) == [(5, "s5")]
+    assert result["checked_against"] == n
+
+
+def test_least_recently_used_question_is_evicted():
+    index = CollusionIndex(threshold=0.9, max_questions=2)
+    index.check_and_add("q1", 1, "a", _vec(0))
+    index.check_and_add("q2", 2, "a", _vec(0))
+    index.check_and_add("q1", 3, "b", _vec(1))  # q1 is now the most recent
+    index.check_and_add("q3", 4, "a", _vec(0))
+
+    assert list(index._indexes) == ["q1", "q3"]
+    assert index.check_and_add("q2", 5, "b", _vec(0))["matches"] == []
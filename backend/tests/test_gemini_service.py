@@ -0,0 +1,157 @@
+import io
+import json
+import os
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gemini_service
+import gemini_stub
+from gemini_stub import StubResponse
+from resilience import OPEN, CircuitBreaker, CircuitOpenError, PoolSaturatedError
+
+
+@pytest.fixture
+def hung_gemini(monkeypatch):
+    """Gemini (stubbed) never answers until the returned event is set."""
+    release = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(gemini_service, "_interactive_pool", pool)
+    monkeypatch.setattr(gemini_service, "_in_flight", {pool: {}, gemini_service._summary_pool: {}})
+    monkeypatch.setattr(
+        gemini_service, "_breaker",
+        CircuitBreaker("test", probe=lambda: None, failure_threshold=3, probe_interval=60),
+    )
+    monkeypatch.setattr(gemini_stub, "enabled", lambda: True)
+    monkeypatch.setattr(gemini_stub, "generate", lambda op, contents: release.wait(5))
+    yield release
+    release.set()
+    pool.shutdown()
+
+
+def test_pool_full_of_hung_calls_trips_breaker(hung_gemini):
+    with pytest.raises(TimeoutError):
+        gemini_service._generate_content("generate", "x", hedge=False, timeout=0.2)
+    # The timed-out attempt still holds the only thread
+    for _ in range(2):
+        with pytest.raises(PoolSaturatedError):
+            gemini_service._generate_content("generate", "x", hedge=False, timeout=0.2)
+
+    assert gemini_service._breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        gemini_service._generate_content("generate", "x", hedge=False, timeout=0.2)
+
+
+def test_pool_busy_with_healthy_calls_does_not_trip_breaker(hung_gemini):
+    slow = threading.Thread(
+        target=lambda: gemini_service._generate_content("generate", "x", hedge=False, timeout=5)
+    )
+    slow.start()
+    # Queued past its own 0.2s timeout behind a call that is still within 5s
+    with pytest.raises(PoolSaturatedError):
+        gemini_service._generate_content("generate", "x", hedge=False, timeout=0.2)
+    hung_gemini.set()
+    slow.join()
+    assert gemini_service._breaker._failures == 0
+
+
+def _pdf(widths) -> bytes:
+    """In-memory PDF with one blank page per width, so pages can differ."""
+    from PyPDF2 import PdfWriter
+
+    writer = PdfWriter()
+    for width in widths:
+        writer.add_blank_page(width=width, height=792)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def fake_genai(monkeypatch):
+    """Minimal google.genai.types so the summarization code builds its requests."""
+    types_module = types.ModuleType("google.genai.types")
+    types_module.Part = types.SimpleNamespace(from_bytes=lambda data, mime_type: data)
+    types_module.GenerateContentConfig = dict
+    genai_module = types.ModuleType("google.genai")
+    genai_module.types = types_module
+    google_module = types.ModuleType("google")
+    google_module.genai = genai_module
+    monkeypatch.setitem(sys.modules, "google", google_module)
+    monkeypatch.setitem(sys.modules, "google.genai", genai_module)
+    monkeypatch.setitem(sys.modules, "google.genai.types", types_module)
+
+
+def test_split_pdf_page_ranges(monkeypatch):
+    from PyPDF2 import PdfReader
+
+    monkeypatch.setattr(gemini_service, "PAGES_PER_CHUNK", 15)
+    monkeypatch.setattr(gemini_service, "MAP_REDUCE_MIN_PAGES", 20)
+    monkeypatch.setattr(gemini_service, "SUMMARY_MODE", "auto")
+
+    chunks = gemini_service._split_pdf(_pdf(range(300, 340)))
+    assert [(first, last) for first, last, _ in chunks] == [(1, 15), (16, 30), (31, 40)]
+    for first, last, chunk_bytes in chunks:
+        pages = PdfReader(io.BytesIO(chunk_bytes)).pages
+        assert [int(p.mediabox.width) for p in pages] == list(range(299 + first, 300 + last))
+
+    short = _pdf(range(300, 310))
+    assert gemini_service._split_pdf(short) == [(1, 10, short)]
+    assert gemini_service._split_pdf(b"not a pdf") == []
+
+
+def test_edited_pdf_only_resummarizes_changed_section(monkeypatch, fake_genai):
+    monkeypatch.setattr(gemini_service, "PAGES_PER_CHUNK", 10)
+    monkeypatch.setattr(gemini_service, "SUMMARY_MODE", "map_reduce")
+    monkeypatch.setattr(gemini_service, "_chunk_cache", OrderedDict())
+    calls = []
+
+    def generate(op, contents, **kwargs):
+        calls.append(op)
+        if op == "summarize_reduce":
+            return StubResponse(json.dumps({"summary": "merged", "concept": "Test"}))
+        return StubResponse(f"section {len(calls)}")
+
+    monkeypatch.setattr(gemini_service, "_generate_content", generate)
+
+    widths = list(range(300, 330))
+    gemini_service._summarize_map_reduce(gemini_service._split_pdf(_pdf(widths)))
+    assert calls.count("summarize_chunk") == 3
+
+    calls.clear()
+    widths[14] += 1  # a small edit on page 15
+    gemini_service._summarize_map_reduce(gemini_service._split_pdf(_pdf(widths)))
+    assert calls == ["summarize_chunk", "summarize_reduce"]
+
+
+def test_failed_section_cancels_pending_sections(monkeypatch, fake_genai):
+    monkeypatch.setattr(gemini_service, "SUMMARY_CONCURRENCY", 2)
+    release = threading.Event()
+    started = []
+
+    def summarize_chunk(first_page, last_page, chunk_bytes):
+        started.append(first_page)
+        if first_page == 1:
+            raise ValueError("Gemini API returned empty summary")
+        release.wait(5)
+        return "section"
+
+    monkeypatch.setattr(gemini_service, "_summarize_chunk", summarize_chunk)
+    chunks = [(i * 10 + 1, i * 10 + 10, b"") for i in range(6)]
+
+    start = time.monotonic()
+    with pytest.raises(ValueError):
+        gemini_service._summarize_map_reduce(chunks)
+    assert time.monotonic() - start < 1
+    release.set()
+    time.sleep(0.1)
+    # The failed worker may pick up one more section before the failure is
+    # seen; everything after that was cancelled rather than summarized
+    assert len(started) <= 3 < len(chunks)
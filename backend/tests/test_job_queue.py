@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+
+def _wait_for(queue: JobQueue, job_id: str, status: str, timeout: float = 5) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} is {queue.get(job_id)['status']}, expected {status}")
+
+
+def test_same_content_is_deduplicated(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), num_workers=1)
+    release = threading.Event()
+    calls = []
+
+    def handler(payload, report_progress):
+        calls.append(payload)
+        release.wait(5)
+        return {"filename": payload["filename"]}
+
+    queue.register("upload", handler)
+    queue.start()
+
+    first, created = queue.submit("upload", "abc", {"filename": "a.pdf"})
+    assert created
+    # While the first is still running, and again once it has finished
+    again, created = queue.submit("upload", "abc", {"filename": "b.pdf"})
+    assert not created and again["job_id"] == first["job_id"]
+    release.set()
+    _wait_for(queue, first["job_id"], DONE)
+    again, created = queue.submit("upload", "abc", {"filename": "c.pdf"})
+    assert not created and again["result"] == {"filename": "a.pdf"}
+
+    other, created = queue.submit("upload", "def", {"filename": "d.pdf"})
+    assert created and other["job_id"] != first["job_id"]
+    _wait_for(queue, other["job_id"], DONE)
+    assert [p["filename"] for p in calls] == ["a.pdf", "d.pdf"]
+
+
+def test_interrupted_job_is_requeued_after_restart(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    crashed = JobQueue(db_path, num_workers=1)
+    job, _ = crashed.submit("upload", "abc", {"filename": "a.pdf"})
+    # Simulate a process that claimed the job and died mid-run
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE jobs SET status = ? WHERE id = ?", (RUNNING, job["job_id"]))
+
+    restarted = JobQueue(db_path, num_workers=1)
+    assert restarted.get(job["job_id"])["status"] == QUEUED
+    restarted.register("upload", lambda payload, report_progress: {"ok": payload["filename"]})
+    restarted.start()
+    assert _wait_for(restarted, job["job_id"], DONE)["result"] == {"ok": "a.pdf"}
+
+
+def test_failed_job_is_retried_with_a_fresh_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), num_workers=1)
+    attempts = []
+
+    def handler(payload, report_progress):
+        attempts.append(payload)
+        if len(attempts) == 1:
+            raise RuntimeError("Gemini unavailable")
+        report_progress("summarizing")
+        return {"ok": True}
+
+    queue.register("upload", handler)
+    queue.start()
+
+    first, _ = queue.submit("upload", "abc", {"filename": "a.pdf"})
+    failed = _wait_for(queue, first["job_id"], FAILED)
+    assert failed["error"] == "Gemini unavailable"
+
+    retry, created = queue.submit("upload", "abc", {"filename": "a.pdf"})
+    assert created and retry["job_id"] != first["job_id"]
+    assert _wait_for(queue, retry["job_id"], DONE)["result"] == {"ok": True}
+    assert queue.get(first["job_id"])["status"] == FAILED
@@ -0,0 +1,114 @@
+import os
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ml_service
+
+
+@pytest.fixture
+def fake_sentence_transformers(monkeypatch):
+    """Stand-in sentence_transformers whose models are slow to load."""
+    loads = []
+
+    class SlowModel:
+        def __init__(self, name):
+            loads.append(name)
+            time.sleep(0.1)
+
+    module = types.ModuleType("sentence_transformers")
+    module.SentenceTransformer = SlowModel
+    module.CrossEncoder = SlowModel
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    for name in ("_similarity_model", "_nli_model", "_small_nli_model"):
+        monkeypatch.setattr(ml_service, name, None)
+    return loads
+
+
+def test_concurrent_first_requests_load_each_model_once(fake_sentence_transformers):
+    loaders = [ml_service._get_similarity_model, ml_service._get_nli_model, ml_service._get_small_nli_model]
+    start = threading.Barrier(12)
+
+    def load(loader):
+        start.wait()
+        return loader()
+
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        models = list(pool.map(load, loaders * 4))
+
+    assert sorted(fake_sentence_transformers) == sorted(
+        ["sentence-transformers/all-MiniLM-L6-v2", ml_service.NLI_MODEL, ml_service.SMALL_NLI_MODEL]
+    )
+    for i in range(len(loaders)):
+        assert all(model is models[i] for model in models[i::3])
+
+
+class StubNLI:
+    """CrossEncoder stand-in returning fixed logits for every pair."""
+
+    def __init__(self, logits):
+        self.logits = logits
+        self.calls = 0
+
+    def predict(self, pairs, batch_size=32):
+        self.calls += 1
+        rows = self.logits if isinstance(self.logits[0], list) else [self.logits] * len(pairs)
+        return np.array(rows[:len(pairs)], dtype=np.float32)
+
+
+@pytest.fixture
+def nli_models(monkeypatch):
+    def install(small_logits, full_logits):
+        small, full = StubNLI(small_logits), StubNLI(full_logits)
+        monkeypatch.setattr(ml_service, "_get_small_nli_model", lambda: small)
+        monkeypatch.setattr(ml_service, "_get_nli_model", lambda: full)
+        return small, full
+    return install
+
+
+def test_confident_small_model_decides(nli_models):
+    # Labels are (contradiction, entailment, neutral)
+    small, full = nli_models([0.0, 5.0, 0.0], [5.0, 0.0, 0.0])
+    result = ml_service.check_correctness("student", "sample", mode="cascade")
+
+    assert result["stage"] == "small"
+    assert result["label"] == "entailment"
+    assert result["margin"] >= ml_service.CASCADE_MARGIN
+    assert full.calls == 0
+
+
+def test_close_call_escalates_to_full_model(nli_models):
+    small, full = nli_models([1.0, 1.1, 0.0], [5.0, 0.0, 0.0])
+    result = ml_service.check_correctness("student", "sample", mode="cascade")
+
+    assert result["stage"] == "full"
+    assert result["label"] == "contradiction"
+    assert small.calls == 1 and full.calls == 1
+
+
+def test_full_mode_skips_small_model(nli_models):
+    small, full = nli_models([0.0, 5.0, 0.0], [5.0, 0.0, 0.0])
+    assert ml_service.check_correctness("student", "sample", mode="full")["stage"] == "full"
+    assert small.calls == 0
+
+
+def test_evaluate_cascade_reports_escalation_and_agreement(nli_models):
+    nli_models(
+        # confident + agrees, confident + disagrees, close call
+        [[0.0, 5.0, 0.0], [5.0, 0.0, 0.0], [1.0, 1.1, 0.0]],
+        [[0.0, 5.0, 0.0], [0.0, 5.0, 0.0], [0.0, 0.0, 5.0]],
+    )
+    pairs = [("sample", "student")] * 3
+    never, default, always = ml_service.evaluate_cascade(pairs, [0.0, 0.3, 1.01])
+
+    assert never["escalation_rate"] == 0.0 and never["agreement"] == pytest.approx(1 / 3, abs=1e-4)
+    assert default["escalation_rate"] == pytest.approx(1 / 3, abs=1e-4)
+    assert default["agreement"] == pytest.approx(2 / 3, abs=1e-4)
+    assert always["escalation_rate"] == 1.0 and always["agreement"] == 1.0
@@ -0,0 +1,80 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resilience import CLOSED, OPEN, CircuitBreaker, CircuitOpenError, PoolSaturatedError, hedged_call
+
+
+def test_timeout_starts_when_call_starts_not_when_queued():
+    pool = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    pool.submit(release.wait)  # occupy the only thread
+
+    threading.Timer(0.3, release.set).start()
+    # Queued for ~0.3s, runs for 0.1s: within the 0.2s call timeout
+    result = hedged_call(lambda: time.sleep(0.1) or "ok", pool, None, timeout=0.2, queue_timeout=1)
+    assert result == "ok"
+
+
+def test_saturated_pool_is_not_reported_as_timeout():
+    pool = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    pool.submit(release.wait)
+
+    with pytest.raises(PoolSaturatedError):
+        hedged_call(lambda: "never", pool, None, timeout=1, queue_timeout=0.1)
+    release.set()
+
+
+def test_hedge_answers_when_first_attempt_is_slow():
+    pool = ThreadPoolExecutor(max_workers=2)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        time.sleep(1 if len(calls) == 1 else 0.05)
+        return len(calls)
+
+    start = time.perf_counter()
+    assert hedged_call(fn, pool, hedge_delay=0.1, timeout=2) == 2
+    assert time.perf_counter() - start < 0.5
+
+
+def test_breaker_trips_probes_and_closes():
+    healthy = threading.Event()
+    probes = []
+
+    def probe():
+        probes.append(1)
+        if not healthy.is_set():
+            raise ConnectionError("still down")
+
+    breaker = CircuitBreaker("test", probe, failure_threshold=3, probe_interval=0.05)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # a success resets the consecutive count
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.before_call()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.2)
+    assert breaker.state == OPEN and len(probes) >= 2
+
+    healthy.set()
+    deadline = time.monotonic() + 2
+    while breaker.state == OPEN and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert breaker.state == CLOSED
+    breaker.before_call()
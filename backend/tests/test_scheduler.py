@@ -0,0 +1,134 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import Flask, jsonify
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scheduler as scheduler_module
+from scheduler import (
+    GENERATION, INTERACTIVE, UPLOAD, QueueFullError, RequestScheduler, required_threads, scheduled,
+)
+
+
+def _make_app(release_generation: threading.Event):
+    app = Flask(__name__)
+
+    @app.route("/generate", methods=["POST"])
+    @scheduled(GENERATION)
+    def generate():
+        release_generation.wait(5)
+        return jsonify({"ok": True})
+
+    @app.route("/detect", methods=["POST"])
+    @scheduled(INTERACTIVE)
+    def detect():
+        return jsonify({"ok": True})
+
+    return app
+
+
+def test_generation_burst_does_not_starve_detect(monkeypatch):
+    limits = {INTERACTIVE: 4, GENERATION: 2, UPLOAD: 1}
+    depths = {INTERACTIVE: 8, GENERATION: 4, UPLOAD: 2}
+    sched = RequestScheduler(limits, depths, total_slots=5, max_wait=5)
+    monkeypatch.setattr(scheduler_module, "scheduler", sched)
+
+    release_generation = threading.Event()
+    client = _make_app(release_generation).test_client()
+
+    # Mirrors gunicorn's gthread pool, sized the same way gunicorn_config does
+    with ThreadPoolExecutor(max_workers=required_threads(limits, depths, total_slots=5)) as pool:
+        burst = [pool.submit(client.post, "/generate") for _ in range(10)]
+        time.sleep(0.2)
+        assert sched.stats()[GENERATION]["queued"] == 4
+
+        start = time.perf_counter()
+        detect = pool.submit(client.post, "/detect").result(timeout=2)
+        detect_seconds = time.perf_counter() - start
+
+        release_generation.set()
+        statuses = sorted(f.result().status_code for f in burst)
+
+    assert detect.status_code == 200
+    assert detect_seconds < 0.5
+    # Two generation calls ran, four queued and ran after them, the rest were shed
+    assert statuses == [200] * 6 + [503] * 4
+    assert all(f.result().headers.get("Retry-After") for f in burst if f.result().status_code == 503)
+
+
+def test_retry_after_reflects_run_time_of_the_class():
+    limits = {INTERACTIVE: 1, GENERATION: 1, UPLOAD: 1}
+    depths = {INTERACTIVE: 0, GENERATION: 1, UPLOAD: 0}
+    sched = RequestScheduler(limits, depths, total_slots=3, max_wait=0.1)
+
+    sched.acquire(GENERATION)
+    # Nothing has finished yet, so the estimate falls back to max_wait
+    with pytest.raises(QueueFullError) as shed:
+        sched.acquire(GENERATION)
+    assert shed.value.retry_after == 1
+
+    sched.release(GENERATION, duration=20.0)
+    sched.acquire(GENERATION)
+    queued = threading.Thread(target=pytest.raises, args=(QueueFullError, sched.acquire, GENERATION))
+    queued.start()
+    time.sleep(0.03)
+    # One running and one queued, each taking ~20s
+    with pytest.raises(QueueFullError) as shed:
+        sched.acquire(GENERATION)
+    assert shed.value.retry_after == 40
+    queued.join()
+
+
+def test_interactive_waiters_are_admitted_before_lower_classes():
+    limits = {INTERACTIVE: 1, GENERATION: 1, UPLOAD: 1}
+    depths = {INTERACTIVE: 4, GENERATION: 4, UPLOAD: 4}
+    sched = RequestScheduler(limits, depths, total_slots=1, max_wait=5)
+    order = []
+
+    sched.acquire(UPLOAD)
+
+    def run(request_class):
+        sched.acquire(request_class)
+        order.append(request_class)
+        sched.release(request_class)
+
+    threads = [threading.Thread(target=run, args=(c,)) for c in (GENERATION, INTERACTIVE)]
+    for t in threads:
+        t.start()
+        time.sleep(0.05)
+    sched.release(UPLOAD)
+    for t in threads:
+        t.join(timeout=2)
+
+    assert order == [INTERACTIVE, GENERATION]
+    assert sched.stats()[INTERACTIVE]["queue_wait_ms"]["max"] > 0
+
+
+def test_streamed_response_holds_slot_until_closed(monkeypatch):
+    from flask import Response
+    from scheduler import STREAM
+
+    limits = {INTERACTIVE: 1, GENERATION: 1, UPLOAD: 1, STREAM: 1}
+    depths = {INTERACTIVE: 0, GENERATION: 0, UPLOAD: 0, STREAM: 0}
+    sched = RequestScheduler(limits, depths, sum(limits.values()), max_wait=1)
+    monkeypatch.setattr(scheduler_module, "scheduler", sched)
+
+    app = Flask(__name__)
+
+    @app.route("/events")
+    @scheduled(STREAM)
+    def events():
+        return Response(iter(["data: 1\n\n", "data: 2\n\n"]), mimetype="text/event-stream")
+
+    client = app.test_client()
+    response = client.get("/events", buffered=False)
+    assert sched.stats()[STREAM]["running"] == 1
+    assert client.get("/events").status_code == 503
+
+    response.close()
+    assert sched.stats()[STREAM]["running"] == 0
@@ -0,0 +1,110 @@
+"""Opt-in capture of production traffic for offline replay (see replay_traffic.py).
+
+Set TRAFFIC_CAPTURE_PATH to append one compact JSON line per request:
+
+    {"t": 1760000000.123, "r": "/api/questions/generate", "m": "POST",
+     "s": 200, "ms": 8123.4, "in": 2048, "out": 9312, "sr": 0.1,
+     "p": {"concept": 24, ...}}
+
+``t`` is the wall-clock arrival time, so captures from several processes
+or restarts appended to one file interleave correctly. ``sr`` is the
+TRAFFIC_CAPTURE_SAMPLE rate the record was captured at; replay uses it to
+restore the original request rate.
+
+Only the route pattern is kept (never the concrete URL), and payloads are
+reduced to their shape: string lengths, list sizes and value types, no
+values (apart from a few enum fields such as question_type). Gemini call
+latencies are logged as {"t": ..., "u": op, "ms": ...} so the replay tool
+can stub Gemini with a realistic latency distribution.
+"""
+import json
+import os
+import random
+import threading
+import time
+
+CAPTURE_PATH = os.environ.get("TRAFFIC_CAPTURE_PATH")
+SAMPLE_RATE = float(os.environ.get("TRAFFIC_CAPTURE_SAMPLE", "1.0"))
+# Low-cardinality enum fields whose values change which code path runs;
+# these are kept verbatim (as "=value") instead of reduced to a length.
+KEEP_VALUES = {"question_type", "difficulty", "type"}
+
+_lock = threading.Lock()
+_file = None
+
+
+def enabled() -> bool:
+    return bool(CAPTURE_PATH)
+
+
+def _write(record: dict) -> None:
+    global _file
+    line = json.dumps(record, separators=(",", ":"))
+    with _lock:
+        if _file is None:
+            _file = open(CAPTURE_PATH, "a", buffering=1)
+        _file.write(line + "\n")
+
+
+def payload_shape(value):
+    """Anonymised structure of a JSON value: lengths and types, no content."""
+    if isinstance(value, dict):
+        return {
+            key: f"={item}" if key in KEEP_VALUES and isinstance(item, str) else payload_shape(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [len(value), payload_shape(value[0]) if value else None]
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, bool):
+        return "b"
+    if isinstance(value, (int, float)):
+        return "n"
+    return None
+
+
+def record_upstream(op: str, seconds: float) -> None:
+    """Log the latency of one upstream (Gemini) call."""
+    if enabled():
+        _write({"t": round(time.time(), 3), "u": op, "ms": round(seconds * 1000, 1)})
+
+
+def install_recorder(app) -> None:
+    """Attach the recorder to a Flask app. No-op unless TRAFFIC_CAPTURE_PATH is set."""
+    if not enabled():
+        return
+
+    from flask import g, request
+
+    @app.before_request
+    def _start_trace():
+        if random.random() < SAMPLE_RATE:
+            g.trace_start = time.perf_counter()
+            g.trace_time = time.time()
+
+    @app.after_request
+    def _finish_trace(response):
+        start = g.pop("trace_start", None)
+        if start is None:
+            return response
+
+        if request.mimetype == "multipart/form-data":
+            shape = {"files": {name: request.content_length or 0 for name in request.files}}
+        else:
+            shape = payload_shape(request.get_json(silent=True))
+
+        _write({
+            "t": round(g.pop("trace_time"), 3),
+            "r": request.url_rule.rule if request.url_rule else "<unmatched>",
+            "m": request.method,
+            "s": response.status_code,
+            "ms": round((time.perf_counter() - start) * 1000, 1),
+            "in": request.content_length or 0,
+            "out": response.calculate_content_length() or 0,
+            "sr": SAMPLE_RATE,
+            "p": shape,
+        })
+        return response
+
+    print(f"🎙️  Recording traffic to {CAPTURE_PATH} (sample rate {SAMPLE_RATE:.0%})")
@@ -19,7 +19,7 @@ export interface CreateAssessmentResponse {
 
 export interface SubmitAnswerRequest {
   question_id: number;
-  student_id: number;
+  student_id: string;
   answer_text: string;
   response_time_seconds: number;
   reference_pdf?: string;
@@ -34,6 +34,22 @@ export interface SubmitAnswerResponse {
 }
 
 
+const STUDENT_ID_KEY = 'trulearn_student_id';
+
+/**
+ * Stable anonymous id for this browser, used by the backend to tell a
+ * student's own resubmissions apart from copying between students.
+ */
+export const getStudentId = (): string => {
+  let studentId = localStorage.getItem(STUDENT_ID_KEY);
+  if (!studentId) {
+    studentId = crypto.randomUUID();
+    localStorage.setItem(STUDENT_ID_KEY, studentId);
+  }
+  return studentId;
+};
+
+
 //Create new assessment
 
 export const createAssessment = async (
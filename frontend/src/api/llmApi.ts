@@ -1,3 +1,4 @@
+import axios from 'axios';
 import apiClient from './client';
 import { Question } from '../types/assessment.types';
 import { ENABLE_MOCK_MODE, simulateDelay, logMockCall } from '../config/mockMode';
@@ -43,12 +44,52 @@ export const generateQuestions = async (
   return response.data;
 };
 
+export interface PdfUploadResult {
+  text: string;
+  concept: string;
+  filename: string;
+}
+
+interface UploadJob {
+  job_id: string;
+  status: 'queued' | 'running' | 'done' | 'failed';
+  progress: string | null;
+  result: PdfUploadResult | null;
+  error: string | null;
+  status_url: string;
+}
+
+const JOB_POLL_INTERVAL_MS = 1500;
+const JOB_TIMEOUT_MS = 10 * 60 * 1000; // give up on a job stuck in queued/running
+
 /**
- * Upload PDF and extract text + concept for question generation
+ * Fetch a job's status. A 503 means the server shed the poll under load,
+ * not that the job failed, so wait for its Retry-After and ask again.
+ */
+const pollJob = async (statusUrl: string, deadline: number): Promise<UploadJob> => {
+  for (;;) {
+    try {
+      return (await apiClient.get<UploadJob>(statusUrl)).data;
+    } catch (error) {
+      if (!axios.isAxiosError(error) || error.response?.status !== 503) {
+        throw error;
+      }
+      const retryAfterMs = Number(error.response.headers['retry-after']) * 1000 || JOB_POLL_INTERVAL_MS;
+      if (Date.now() + retryAfterMs > deadline) {
+        throw new Error('Timed out waiting for the PDF to be processed. Please try again.');
+      }
+      await new Promise((resolve) => setTimeout(resolve, retryAfterMs));
+    }
+  }
+};
+
+/**
+ * Upload PDF and extract text + concept for question generation.
+ * The backend queues the PDF for summarization, so we poll the job until it finishes.
  */
 export const uploadPdfForQuestions = async (
   file: File
-): Promise<{ text: string; concept: string; filename: string }> => {
+): Promise<PdfUploadResult> => {
   // Mock mode: return mock data without API call
   if (ENABLE_MOCK_MODE) {
     logMockCall('POST /api/upload-reference', { filename: file.name });
@@ -60,7 +101,7 @@ export const uploadPdfForQuestions = async (
   const formData = new FormData();
   formData.append('pdf', file);  // Flask expects 'pdf' field name
 
-  const response = await apiClient.post<{ text: string; concept: string; filename: string }>(
+  const response = await apiClient.post<UploadJob>(
     '/api/upload-reference',
     formData,
     {
@@ -70,7 +111,20 @@ export const uploadPdfForQuestions = async (
     }
   );
 
-  return response.data;
+  let job = response.data;
+  const deadline = Date.now() + JOB_TIMEOUT_MS;
+  while (job.status === 'queued' || job.status === 'running') {
+    if (Date.now() > deadline) {
+      throw new Error('Timed out waiting for the PDF to be processed. Please try again.');
+    }
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    job = await pollJob(job.status_url, deadline);
+  }
+
+  if (job.status === 'failed' || !job.result) {
+    throw new Error(job.error || 'Error processing PDF');
+  }
+  return job.result;
 };
 
 /**
@@ -33,7 +33,7 @@ import EmojiObjectsIcon from '@mui/icons-material/EmojiObjects';
 import SendIcon from '@mui/icons-material/Send';
 import ExpandMoreIcon from '@mui/icons-material/ExpandMore';
 import { generateQuestions, uploadPdfForQuestions } from '../../api/llmApi';
-import { submitAnswer, runDetection } from '../../api/assessmentApi';
+import { submitAnswer, runDetection, getStudentId } from '../../api/assessmentApi';
 
 interface QuestionResult {
   question: Question;
@@ -148,7 +148,7 @@ const AssessmentView: React.FC = () => {
           const sampleAnswer = question.sample_answer;
           const answerData = {
             question_id: question.id,
-            student_id: 1,
+            student_id: getStudentId(),
             answer_text: answerText,
             response_time_seconds: 0,
             reference_pdf: uploadedPdf?.name,
@@ -31,7 +31,7 @@ export type Question = MultipleChoiceQuestion | OpenEndedQuestion;
 export interface Answer {
   id?: number;
   question_id: number;
-  student_id: number;
+  student_id: string;
   answer_text: string; // Selected option (A/B/C/D) or written response
   response_time_seconds: number;
   submitted_at?: string;